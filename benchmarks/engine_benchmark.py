@@ -0,0 +1,297 @@
+"""Engine throughput benchmark.
+
+Plays complete games with the game engine in-process against deterministic scripted players, and
+reports records/s, queries/s, the time spent in each phase of the game, and peak memory. The
+scripted players answer queries directly instead of through pipes, so the numbers measure the
+engine's own work: building and censoring updates, serialising queries, parsing and validating
+moves, committing records and writing the output files.
+
+Games are seeded, so the same games are played on every run. The game each seed plays (its result and
+number of records and queries) is checked against benchmarks/games.json on every run, so a change in the
+engine's behaviour is caught on any machine, update it with --save-games if the change is intended.
+
+Timings depend on the machine, so they are compared against a baseline you save yourself on the same
+machine, before making your change. Baselines aren't committed.
+
+    python benchmarks/engine_benchmark.py --save-baseline benchmarks/baseline.json
+    ... make your change ...
+    python benchmarks/engine_benchmark.py --baseline benchmarks/baseline.json
+"""
+
+import argparse
+from collections import defaultdict
+from contextlib import contextmanager, redirect_stdout
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+from time import perf_counter
+import tracemalloc
+from typing import Any, Iterator, Optional
+
+
+# Metrics compared against the baseline, and whether a larger value is an improvement.
+COMPARED_METRICS = {
+    "records_per_second": True,
+    "queries_per_second": True,
+    "peak_memory_bytes": False,
+}
+PHASES = ["claim_territories", "place_initial_troops", "troop", "attack", "fortify"]
+GAMES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "games.json")
+
+
+def setup_core_directory(core_directory: str) -> None:
+    """The engine reads its core directory from the environment when it is imported, so this must run first.
+    """
+
+    os.makedirs(f"{core_directory}/input")
+    os.makedirs(f"{core_directory}/output")
+    with open(f"{core_directory}/input/catalog.json", "w") as f:
+        json.dump([{"team_id": x} for x in range(5)], f)
+
+    os.environ["GAME_ENGINE_CORE_DIRECTORY"] = core_directory
+
+
+def run_game(seed: int, measure_memory: bool) -> dict[str, Any]:
+    import risk_engine.connection.player_connection as player_connection
+    from risk_engine.connection.player_connection import PlayerConnection
+    from risk_engine.game_engine import GameEngine
+    from risk_shared.models.player_model import PlayerModel
+    from scripted_player import ScriptedPlayer
+
+    # The scripted players answer immediately, but the engine's share of a long game can still add up
+    # past the cumulative limit on a slow machine or under tracemalloc, which would change the game.
+    player_connection.CUMULATIVE_TIMEOUT_SECONDS = math.inf
+
+    class ScriptedPlayerConnection(PlayerConnection): # type: ignore[misc]
+
+        def __init__(self, player_id: int, player: ScriptedPlayer):
+            self.player = player
+            self.queries = 0
+            self.player_time = 0.0
+            self._query = ""
+            super().__init__(player_id)
+
+
+        def _open_pipes(self):
+            pass
+
+
+        def _send(self, data: str) -> None:
+            self._query = data
+            self.queries += 1
+
+
+        def _receive(self) -> str:
+            start = perf_counter()
+            result = self.player.respond(json.loads(self._query))
+            self._first_byte_time = perf_counter()
+            self.player_time += self._first_byte_time - start
+            return result
+
+
+    class BenchmarkGameEngine(GameEngine):
+
+        def __init__(self, seed: int):
+            super().__init__(seed=seed)
+            self.phase_seconds: dict[str, float] = defaultdict(float)
+
+
+        def _connect(self):
+            self.connections = dict([(x, ScriptedPlayerConnection(x, ScriptedPlayer(x, self.state))) for x in self.state.players.keys()])
+
+
+        def player_time(self) -> float:
+            return sum(connection.player_time for connection in self.connections.values()) # type: ignore
+
+
+        @contextmanager
+        def _timed(self, phase: str) -> Iterator[None]:
+            start, start_player_time = perf_counter(), self.player_time()
+            try:
+                yield
+            finally:
+                self.phase_seconds[phase] += (perf_counter() - start) - (self.player_time() - start_player_time)
+
+
+        def _start_claim_territories_phase(self):
+            with self._timed("claim_territories"):
+                super()._start_claim_territories_phase()
+
+
+        def _start_place_initial_troops_phase(self):
+            with self._timed("place_initial_troops"):
+                super()._start_place_initial_troops_phase()
+
+
+        def _troop_phase(self, player: PlayerModel, connection: PlayerConnection):
+            with self._timed("troop"):
+                super()._troop_phase(player, connection)
+
+
+        def _attack_phase(self, player: PlayerModel, connection: PlayerConnection):
+            with self._timed("attack"):
+                super()._attack_phase(player, connection)
+
+
+        def _fortify_phase(self, player: PlayerModel, connection: PlayerConnection):
+            with self._timed("fortify"):
+                super()._fortify_phase(player, connection)
+
+
+    if measure_memory:
+        tracemalloc.start()
+
+    start = perf_counter()
+    with redirect_stdout(io.StringIO()):
+        engine = BenchmarkGameEngine(seed)
+        engine.start()
+    wall_seconds = perf_counter() - start
+
+    peak_memory_bytes: Optional[int] = None
+    if measure_memory:
+        _, peak_memory_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    engine_seconds = wall_seconds - engine.player_time()
+    records = len(engine.state.recording)
+    queries = sum(connection.queries for connection in engine.connections.values()) # type: ignore
+    return {
+        "seed": seed,
+        "result": engine.inspector.get_result().model_dump(exclude={"seed"}),
+        "records": records,
+        "queries": queries,
+        "engine_seconds": engine_seconds,
+        "records_per_second": records / engine_seconds,
+        "queries_per_second": queries / engine_seconds,
+        "phase_seconds": dict([(phase, engine.phase_seconds[phase]) for phase in PHASES]),
+        "peak_memory_bytes": peak_memory_bytes,
+    }
+
+
+def run_benchmark(seeds: list[int], repeats: int, measure_memory: bool) -> dict[str, Any]:
+
+    # Warm up first, the first game pays for lazily built validators and type adapters.
+    run_game(seeds[0], measure_memory=False)
+
+    games = []
+    for seed in seeds:
+
+        # Keep the fastest of the timed runs, and take peak memory from a separate run since
+        # tracemalloc slows everything down.
+        runs = [run_game(seed, measure_memory=False) for _ in range(repeats)]
+        game = min(runs, key=lambda x: x["engine_seconds"])
+        if measure_memory:
+            game["peak_memory_bytes"] = run_game(seed, measure_memory=True)["peak_memory_bytes"]
+        games.append(game)
+
+        print(f"seed {seed}: {game['records']} records, {game['records_per_second']:.0f} records/s, {game['queries_per_second']:.0f} queries/s", file=sys.stderr, flush=True)
+
+    engine_seconds = sum(x["engine_seconds"] for x in games)
+    return {
+        "games": games,
+        "total": {
+            "records": sum(x["records"] for x in games),
+            "queries": sum(x["queries"] for x in games),
+            "engine_seconds": engine_seconds,
+            "records_per_second": sum(x["records"] for x in games) / engine_seconds,
+            "queries_per_second": sum(x["queries"] for x in games) / engine_seconds,
+            "phase_seconds": dict([(phase, sum(x["phase_seconds"][phase] for x in games)) for phase in PHASES]),
+            "peak_memory_bytes": max((x["peak_memory_bytes"] for x in games), default=None) if measure_memory else None,
+        }
+    }
+
+
+def get_game_summary(game: dict[str, Any]) -> dict[str, Any]:
+    """Returns the parts of a game's results that don't depend on the machine, which identify the game played.
+    """
+
+    return dict([(x, game[x]) for x in ["seed", "result", "records", "queries"]])
+
+
+def check_games(results: dict[str, Any], expected_games: list[dict[str, Any]], source: str) -> None:
+    """Raises a ValueError if a seed played a different game to the one in 'expected_games', seeds that aren't in
+    'expected_games' aren't checked.
+    """
+
+    expected = dict([(x["seed"], get_game_summary(x)) for x in expected_games])
+    for game in results["games"]:
+        if game["seed"] in expected and get_game_summary(game) != expected[game["seed"]]:
+            raise ValueError(f"Seed {game['seed']} played a different game to {source}, the engine's behaviour has changed.")
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Returns a description of each regression of more than 'tolerance' (a fraction) against the baseline.
+    """
+
+    baseline_seeds = set([x["seed"] for x in baseline["games"]])
+    for game in results["games"]:
+        if game["seed"] not in baseline_seeds:
+            raise ValueError(f"The baseline doesn't include seed {game['seed']}.")
+
+    # The comparison is only meaningful if the same games were played.
+    check_games(results, baseline["games"], "the baseline")
+
+    regressions = []
+    metrics = dict([(x, y) for x, y in COMPARED_METRICS.items()] + [(f"phase_seconds.{x}", False) for x in PHASES])
+    for metric, higher_is_better in metrics.items():
+        current, previous = results["total"], baseline["total"]
+        for key in metric.split("."):
+            current, previous = current[key], previous[key]
+        if current is None or previous is None:
+            continue
+
+        change = (current - previous) / previous
+        print(f"{metric:>36}: {previous:>14.3f} -> {current:>14.3f} ({change:+.1%})")
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{metric} regressed by {abs(change):.1%}.")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="engine_benchmark", description="Measure the engine's throughput on seeded games between scripted players.")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2], help="Seeds of the games to play.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of times to play each game, the fastest run is kept.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip measuring peak memory.")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare against the results in this file, saved on this machine with --save-baseline, exits with status 1 on a regression.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Fractional change allowed before a metric counts as a regression.")
+    parser.add_argument("--save-baseline", type=str, default=None, help="Write the results to this file.")
+    parser.add_argument("--save-games", action="store_true", help=f"Write the games each seed played to {os.path.relpath(GAMES_PATH)}, after an intended change to the engine's behaviour.")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    # The engine writes each game's output files into the core directory, remove them all once the games are played.
+    with tempfile.TemporaryDirectory(prefix="risk_engine_benchmark_") as core_directory:
+        setup_core_directory(core_directory)
+        results = run_benchmark(args.seeds, args.repeats, measure_memory=not args.no_memory)
+
+    if args.save_games:
+        with open(GAMES_PATH, "w") as f:
+            json.dump([get_game_summary(x) for x in results["games"]], f, indent=2)
+    elif os.path.exists(GAMES_PATH):
+        with open(GAMES_PATH, "r") as f:
+            check_games(results, json.load(f), GAMES_PATH)
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(regression)
+        if len(regressions) > 0:
+            sys.exit(1)
+    else:
+        print(json.dumps(results["total"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Import time benchmark.
+
+Imports the modules that bots and the engine start with in fresh interpreters under `python -X importtime`,
+and reports the total time to import each, along with the modules that took the longest themselves. Every
+bot and the engine pay this before they can answer their first query, once per match.
+
+Queries defer building their validators until first used (see BaseQuery), the engine builds them before the
+game starts with build_query_models, so that work isn't included here.
+
+Import times depend on the machine, so compare against a baseline you save yourself on the same machine,
+before making your change. Baselines aren't committed.
+
+    python benchmarks/import_benchmark.py --save-baseline benchmarks/import_baseline.json
+    ... make your change ...
+    python benchmarks/import_benchmark.py --baseline benchmarks/import_baseline.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any
+
+
+# The modules imported on startup, by the bots and by the engine.
+TARGETS = ["risk_helper.game", "risk_engine.session"]
+
+
+def parse_importtime(output: str) -> dict[str, tuple[int, int]]:
+    """Returns the self and cumulative import time in microseconds of each module in the output of -X importtime.
+    """
+
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def time_import(module: str, core_directory: str) -> dict[str, tuple[int, int]]:
+    environment = dict(os.environ, GAME_ENGINE_CORE_DIRECTORY=core_directory)
+    environment.pop("PYTHONPROFILEIMPORTTIME", None)
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, env=environment)
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{process.stderr}")
+
+    times = parse_importtime(process.stderr)
+    if module not in times:
+        raise RuntimeError(f"{module} is missing from the import time output, was it already imported?")
+    return times
+
+
+def run_benchmark(targets: list[str], repeats: int, top: int) -> dict[str, Any]:
+    results = {}
+    with tempfile.TemporaryDirectory() as core_directory:
+        for module in targets:
+
+            # Keep the fastest run, the others are slowed down by whatever else the machine was doing.
+            fastest = min((time_import(module, core_directory) for _ in range(repeats)), key=lambda x: x[module][1])
+            slowest_modules = sorted(fastest.items(), key=lambda x: x[1][0], reverse=True)[:top]
+            results[module] = {
+                "import_ms": fastest[module][1] / 1000,
+                "modules_imported": len(fastest),
+                "slowest_modules_ms": dict([(name, self_us / 1000) for name, (self_us, _) in slowest_modules]),
+            }
+
+    return results
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Returns a description of each regression of more than 'tolerance' (a fraction) against the baseline.
+    """
+
+    regressions = []
+    for module, result in results.items():
+        if module not in baseline:
+            raise ValueError(f"The baseline doesn't include {module}.")
+
+        current, previous = result["import_ms"], baseline[module]["import_ms"]
+        change = (current - previous) / previous
+        print(f"{module:>24}: {previous:>10.1f}ms -> {current:>10.1f}ms ({change:+.1%})")
+        if change > tolerance:
+            regressions.append(f"Importing {module} regressed by {change:.1%}.")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="import_benchmark", description="Measure how long the bots' and the engine's modules take to import.")
+    parser.add_argument("--modules", type=str, nargs="+", default=TARGETS, help="Modules to import.")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of times to import each module, the fastest run is kept.")
+    parser.add_argument("--top", type=int, default=10, help="Number of the slowest individual modules to report.")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare against the results in this file, saved on this machine with --save-baseline, exits with status 1 on a regression.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Fractional change allowed before an import counts as a regression.")
+    parser.add_argument("--save-baseline", type=str, default=None, help="Write the results to this file.")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.modules, args.repeats, args.top)
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(regression)
+        if len(regressions) > 0:
+            sys.exit(1)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import json
+from collections import defaultdict
+from typing import Any, Optional, Tuple, cast
+
+from risk_engine.game.engine_state import EngineState
+from risk_shared.models.card_model import CardModel
+from risk_shared.records.moves.move_attack import MoveAttack
+from risk_shared.records.record_attack import RecordAttack
+
+
+def get_card_set(cards: list[CardModel]) -> Optional[Tuple[CardModel, CardModel, CardModel]]:
+    cards_by_symbol: dict[str, list[CardModel]] = defaultdict(list)
+    for card in cards:
+        cards_by_symbol[card.symbol].append(card)
+
+    symbols = [symbol for symbol in ["Infantry", "Cavalry", "Artillery"] if len(cards_by_symbol[symbol]) > 0]
+    if len(symbols) == 3:
+        return (cards_by_symbol[symbols[0]][0], cards_by_symbol[symbols[1]][0], cards_by_symbol[symbols[2]][0])
+
+    for symbol in symbols:
+        if len(cards_by_symbol[symbol]) >= 3:
+            return (cards_by_symbol[symbol][0], cards_by_symbol[symbol][1], cards_by_symbol[symbol][2])
+
+    # Any three cards including a wildcard are a set.
+    if len(cards_by_symbol["Wildcard"]) > 0 and len(cards) >= 3:
+        others = [card for card in cards if card.card_id != cards_by_symbol["Wildcard"][0].card_id]
+        return (cards_by_symbol["Wildcard"][0], others[0], others[1])
+
+    return None
+
+
+class ScriptedPlayer():
+    """A deterministic player for benchmarking the engine, it reads the engine's state directly
+    instead of tracking its own so that almost all of the time measured is spent in the engine.
+    """
+
+    def __init__(self, player_id: int, state: EngineState):
+        self.player_id = player_id
+        self.state = state
+
+
+    def respond(self, query: dict[str, Any]) -> str:
+        match query["query_type"]:
+            case "claim_territory":
+                move = self._claim_territory()
+            case "place_initial_troop":
+                move = self._place_initial_troop()
+            case "redeem_cards":
+                move = self._redeem_cards(query["cause"])
+            case "distribute_troops":
+                move = self._distribute_troops(query["cause"])
+            case "attack":
+                move = self._attack()
+            case "troops_after_attack":
+                move = self._troops_after_attack(query["record_attack_id"])
+            case "defend":
+                move = self._defend(query["move_attack_id"])
+            case "fortify":
+                move = self._fortify()
+            case _:
+                raise NotImplementedError
+
+        move["move_by_player"] = self.player_id
+        return json.dumps(move)
+
+
+    def _owned(self) -> list[int]:
+        return [x.territory_id for x in self.state.territories.values() if x.occupier == self.player_id]
+
+
+    def _enemy_neighbours(self, territory: int) -> list[int]:
+        return [x for x in self.state.map.get_adjacent_to(territory) if self.state.territories[x].occupier != self.player_id]
+
+
+    def _claim_territory(self) -> dict[str, Any]:
+        unclaimed = [x.territory_id for x in self.state.territories.values() if x.occupier == None]
+        owned = set(self._owned())
+
+        # Grow from the territories we have, each player starts in a different part of the map.
+        adjacent = [x for x in unclaimed if any(y in owned for y in self.state.map.get_adjacent_to(x))]
+        candidates = adjacent if len(adjacent) > 0 else unclaimed
+        territory = min(candidates, key=lambda x: (x - self.player_id * 8) % len(self.state.territories))
+        return {"record_type": "move_claim_territory", "territory": territory}
+
+
+    def _place_initial_troop(self) -> dict[str, Any]:
+        owned = self._owned()
+        border = [x for x in owned if len(self._enemy_neighbours(x)) > 0] or owned
+        territory = min(border, key=lambda x: (self.state.territories[x].troops, x))
+        return {"record_type": "move_place_initial_troop", "territory": territory}
+
+
+    def _redeem_cards(self, cause: str) -> dict[str, Any]:
+        sets = []
+        cards = list(self.state.players[self.player_id].cards)
+        while len(cards) >= 5:
+            card_set = get_card_set(cards)
+            if card_set is None:
+                break
+            sets.append([x.card_id for x in card_set])
+            cards = [card for card in cards if card not in card_set]
+
+        return {"record_type": "move_redeem_cards", "sets": sets, "cause": cause}
+
+
+    def _distribute_troops(self, cause: str) -> dict[str, Any]:
+        player = self.state.players[self.player_id]
+
+        # Everything goes on a matching territory if we have one, otherwise on our strongest border.
+        if len(player.must_place_territory_bonus) > 0:
+            territory = player.must_place_territory_bonus[0]
+        else:
+            owned = self._owned()
+            border = [x for x in owned if len(self._enemy_neighbours(x)) > 0] or owned
+            territory = max(border, key=lambda x: (self.state.territories[x].troops, -x))
+
+        return {"record_type": "move_distribute_troops", "cause": cause, "distributions": {territory: player.troops_remaining}}
+
+
+    def _attack(self) -> dict[str, Any]:
+        for source in sorted(self._owned(), key=lambda x: (-self.state.territories[x].troops, x)):
+            troops = self.state.territories[source].troops
+            if troops < 2:
+                break
+
+            for target in sorted(self._enemy_neighbours(source), key=lambda x: (self.state.territories[x].troops, x)):
+                if troops - 1 > self.state.territories[target].troops:
+                    return {"record_type": "move_attack", "attacking_territory": source, "defending_territory": target, "attacking_troops": min(3, troops - 1)}
+
+        return {"record_type": "move_attack_pass"}
+
+
+    def _troops_after_attack(self, record_attack_id: int) -> dict[str, Any]:
+        record_attack = cast(RecordAttack, self.state.recording[record_attack_id])
+        move_attack = cast(MoveAttack, self.state.recording[record_attack.move_attack_id])
+        troop_count = self.state.territories[move_attack.attacking_territory].troops - 1
+        return {"record_type": "move_troops_after_attack", "record_attack_id": record_attack_id, "troop_count": troop_count}
+
+
+    def _defend(self, move_attack_id: int) -> dict[str, Any]:
+        move_attack = cast(MoveAttack, self.state.recording[move_attack_id])
+        defending_troops = min(2, self.state.territories[move_attack.defending_territory].troops)
+        return {"record_type": "move_defend", "move_attack_id": move_attack_id, "defending_troops": defending_troops}
+
+
+    def _fortify(self) -> dict[str, Any]:
+        # Move the largest stack that isn't on a border towards a border.
+        owned = set(self._owned())
+        interior = [x for x in owned if len(self._enemy_neighbours(x)) == 0 and self.state.territories[x].troops > 1]
+        for source in sorted(interior, key=lambda x: (-self.state.territories[x].troops, x)):
+            targets = [x for x in self.state.map.get_adjacent_to(source) if x in owned and len(self._enemy_neighbours(x)) > 0]
+            if len(targets) > 0:
+                return {"record_type": "move_fortify", "source_territory": source, "target_territory": min(targets), "troop_count": self.state.territories[source].troops - 1}
+
+        return {"record_type": "move_fortify_pass"}
@@ -1,4 +1,3 @@
-import cProfile
 from collections import defaultdict, deque
 import random
 from typing import Optional, Tuple, Union, cast
@@ -36,8 +35,9 @@ class BotState():
 def main():
     
     # Get the game object, which will connect you to the engine and
-    # track the state of the game.
-    game = Game()
+    # track the state of the game. We profile with cProfile, the profile is written to
+    # submission.prof every 100 queries and when the simulator terminates us.
+    game = Game(profile="cprofile", profile_every=100)
     bot_state = BotState()
    
     # Respond to the engine's queries with your moves.
@@ -46,10 +46,6 @@ def main():
         # Get the engine's query (this will block until you receive a query).
         query = game.get_next_query()
 
-        # Exit early so we can write our profiling data before getting killed.
-        if [x.alive for x in game.state.players.values()].count(True) <= 2:
-            return
-
         # Based on the type of query, respond with the correct move.
         def choose_move(query: QueryType) -> MoveType:
             match query:
@@ -206,5 +202,4 @@ def handle_fortify(game: Game, bot_state: BotState, query: QueryFortify) -> Unio
 
 
 if __name__ == "__main__":
-    print("Profiling", flush=True)
-    cProfile.run("main()", "submission.prof")
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -1,15 +1,20 @@
 import json
+import random
+import runpy
 import shutil
-from signal import SIGKILL
+from signal import SIGKILL, SIGTERM
 import subprocess
 import sys
 import os
-from typing import Tuple
+import time
+import traceback
+from typing import Callable, Optional, Tuple
 
 NUM_PLAYERS = 5
 PIPE_PERMISSIONS = 0o660
 FILE_PERMISSIOSN = 0o664
 DIRECTORY_PERMISSIONS = 0o775
+TERMINATE_GRACE_SECONDS = 2
 
 def main():
     
@@ -26,23 +31,66 @@ def main():
         print(f"Total players in the match must be {NUM_PLAYERS}.")
         print_usage()
 
+    seed = None
+    if "--seed" in commands:
+        if len(commands["--seed"]) != 1:
+            print_usage()
+        try:
+            seed = int(commands["--seed"][0])
+        except ValueError:
+            print_usage()
+
+    if "--trace" in commands and len(commands["--trace"]) != 0:
+        print_usage()
+
+    games = 1
+    if "--games" in commands:
+        if len(commands["--games"]) != 1:
+            print_usage()
+        try:
+            games = int(commands["--games"][0])
+        except ValueError:
+            print_usage()
+
+    if "--zygote" in commands:
+        if len(commands["--zygote"]) != 0:
+            print_usage()
+        preload_zygote()
+
     setup_environments(sources)
-    submission_pids = start_submissions()
+    submission_pids = start_submissions(zygote="--zygote" in commands)
 
     if "--engine" in commands:
         if len(commands["--engine"]) != 0:
             print_usage()
-        start_engine()
+        start_engine(seed, trace="--trace" in commands, games=games, zygote="--zygote" in commands)
 
     else:
         print("Once you have finished running the engine, press [Enter] to terminate any still-running submission processes.")
         input()
     
+    terminate_submissions(submission_pids)
+    print("[simulator] simulation complete.")
+
+
+def terminate_submissions(submission_pids: list[int]):
+
+    # Ask the submissions to exit first so they can write any profiles, then kill any that are left.
     for pid in submission_pids:
         print(f"[simulator]: terminating submission pid {pid}.")
-        os.kill(pid, SIGKILL)
+        try:
+            os.kill(pid, SIGTERM)
+        except ProcessLookupError:
+            pass
 
-    print("[simulator] simulation complete.")
+    deadline = time.time() + TERMINATE_GRACE_SECONDS
+    for pid in submission_pids:
+        try:
+            while os.waitpid(pid, os.WNOHANG) == (0, 0) and time.time() < deadline:
+                time.sleep(0.05)
+            os.kill(pid, SIGKILL)
+        except (ChildProcessError, ProcessLookupError):
+            pass
 
 
 def parse_cmd_args(args: list[str]):
@@ -61,7 +109,7 @@ def parse_cmd_args(args: list[str]):
         commands[current_command].append(arg)
 
     for command in commands.keys():
-        if command not in ["--submissions", "--engine"]:
+        if command not in ["--submissions", "--engine", "--seed", "--trace", "--games", "--zygote"]:
             print_usage()
 
     return commands
@@ -76,11 +124,21 @@ def print_usage():
     "                                                       will not be automatically started.\n"
     "       --engine                                    If present, the simulator will start the engine. To run the match without this flag you need to manually\n"
     "                                                       start the engine (for example, while debugging it).\n"
+    "       --seed <seed>                               Seeds the engine's random number generator (turn order, card shuffles and dice rolls) so\n"
+    "                                                       the match can be reproduced, the seed used is written to output/results.json.\n"
+    "       --trace                                     Has the engine write a timeline of the match to output/trace.json, which can be opened in\n"
+    "                                                       chrome://tracing or https://ui.perfetto.dev.\n"
+    "       --games <count>                             Plays <count> games back to back without restarting the submissions, each game's output\n"
+    "                                                       is written to output/game<k>/ and every result to output/session.json.\n"
+    "       --zygote                                    Imports the engine and helper packages once in the simulator and forks the submissions and\n"
+    "                                                       the engine from it, instead of starting each with a fresh interpreter that has to import\n"
+    "                                                       them again. Submissions must use the installed risk_helper.\n"
     "\n"
     "   examples:\n"
     "       python3 match_simulator.py --submissions 5:example_submissions/complex.py --engine\n"
     "       python3 match_simulator.py --submissions 2:example_submissions/complex.py 3:my_submission.py --engine\n"
-    "       python3 match_simulator.py --submissions 4:example_submissions/complex.py d:my_submission.py --engine\n")
+    "       python3 match_simulator.py --submissions 4:example_submissions/complex.py d:my_submission.py --engine\n"
+    "       python3 match_simulator.py --submissions 5:example_submissions/complex.py --engine --seed 42\n")
     sys.exit(0)
 
 
@@ -108,25 +166,106 @@ def setup_environments(sources: list[Tuple[int, str]]):
 
 
 
-def start_submissions() -> list[int]:
+def preload_zygote():
+    """Imports everything the submissions and the engine need at startup, so that processes forked from the
+    simulator start with it already loaded.
+    """
+
+    started = time.time()
+    try:
+        from risk_engine.connection.player_connection import get_union_type_adapter
+        import risk_engine.session
+        import risk_helper.game
+        from risk_shared.maps import earth
+        from risk_shared.queries.build_queries import build_query_models
+        from risk_shared.records.moves.move_attack import MoveAttack
+        from risk_shared.records.moves.move_attack_pass import MoveAttackPass
+        from risk_shared.records.moves.move_fortify import MoveFortify
+        from risk_shared.records.moves.move_fortify_pass import MoveFortifyPass
+    except ImportError as e:
+        print(f"[simulator] zygote could not preload the packages ({e}), processes will import them after forking.")
+        return
+
+    earth.get_map()
+    earth.get_cards()
+    build_query_models()
+    get_union_type_adapter(MoveAttack, MoveAttackPass)
+    get_union_type_adapter(MoveFortify, MoveFortifyPass)
+    print(f"[simulator] zygote preloaded in {time.time() - started:.2f}s.")
+
+
+def fork_child(run: Callable[[], None], stdout: int, stderr: int) -> int:
+    """Forks a child that runs 'run' with its stdout and stderr redirected to the given file descriptors,
+    returns the child's pid. The child never returns from here.
+    """
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid != 0:
+        return pid
+
+    os.dup2(stdout, 1)
+    os.dup2(stderr, 2)
+
+    # Each child gets its own random state, rather than every child repeating the simulator's.
+    random.seed()
+
+    code = 0
+    try:
+        run()
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def run_submission():
+    sys.argv = ["submission.py"]
+    sys.path.insert(0, os.getcwd())
+    runpy.run_path("submission.py", run_name="__main__")
+
+
+def start_submissions(zygote: bool = False) -> list[int]:
     player_pids = []
     for player in range(NUM_PLAYERS):
         os.chdir(f"submission{player}")
 
         with open("io/submission.log", "w") as f_log, open("io/submission.err", "w") as f_err:
-            process = subprocess.Popen(["python3", "submission.py"], stdout=f_log, stderr=f_err)
+            if zygote:
+                pid = fork_child(run_submission, f_log.fileno(), f_err.fileno())
+            else:
+                pid = subprocess.Popen(["python3", "submission.py"], stdout=f_log, stderr=f_err).pid
         
-        player_pids.append(process.pid)
-        print(f"[simulator]: started submission {player} (pid={process.pid}).")
+        player_pids.append(pid)
+        print(f"[simulator]: started submission {player} (pid={pid}).")
         os.chdir("..")
 
     return player_pids
 
 
-def start_engine():
+def start_engine(seed: Optional[int] = None, trace: bool = False, games: int = 1, zygote: bool = False):
     print("[simulator] started engine.")
+    args = ["--print-recording-interactive"]
+    if seed is not None:
+        args.extend(["--seed", str(seed)])
+    if trace:
+        args.append("--trace")
+    if games != 1:
+        args.extend(["--games", str(games)])
+
+    if zygote:
+        run_forked_engine(args)
+        print("[simulator] engine terminated.")
+        return
+
     with open("output/engine.log", "w") as f_log, open("output/engine.err", "w") as f_err:
-        process = subprocess.Popen(["python3", "-m", "risk_engine", "--print-recording-interactive"], stdout=subprocess.PIPE, stderr=f_err, text=True, universal_newlines=True, bufsize=1)
+        process = subprocess.Popen(["python3", "-m", "risk_engine"] + args, stdout=subprocess.PIPE, stderr=f_err, text=True, universal_newlines=True, bufsize=1)
 
         while True:
             if process.stdout is not None:
@@ -138,6 +277,27 @@ def start_engine():
 
     print("[simulator] engine terminated.")
 
+
+def run_forked_engine(args: list[str]):
+    def run_engine():
+        sys.argv = ["risk_engine"] + args
+        runpy.run_module("risk_engine", run_name="__main__", alter_sys=True)
+
+    read_fd, write_fd = os.pipe()
+    with open("output/engine.log", "w") as f_log, open("output/engine.err", "w") as f_err:
+        pid = fork_child(run_engine, write_fd, f_err.fileno())
+        os.close(write_fd)
+
+        with os.fdopen(read_fd, "r") as engine_stdout:
+            while True:
+                data = engine_stdout.read(1)
+                if not data:
+                    break
+                print(data, end="", flush=True)
+                f_log.write(data)
+
+    os.waitpid(pid, 0)
+
 def setup_environment_for_player(player: int, source: str):
     os.makedirs(f"submission{player}/io", mode=DIRECTORY_PERMISSIONS)
     os.mkfifo(f"submission{player}/io/to_engine.pipe", mode=PIPE_PERMISSIONS)
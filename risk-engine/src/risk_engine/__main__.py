@@ -1,7 +1,22 @@
-import sys
-import cProfile
-from risk_engine.game_engine import GameEngine
+import argparse
+from risk_engine.config.ioconfig import CORE_DIRECTORY, PROFILE_MODE, TRACE_MATCH, TRACE_MEMORY
+from risk_engine.session import run_session
+from risk_shared.profiling.profiler import PROFILE_MODES, Profiler, get_profile_mode
 
-game = GameEngine(len(sys.argv) > 1 and sys.argv[1] == "--print-recording-interactive")
-game.start()
-#cProfile.run("game.start()", "./output/engine.prof")
\ No newline at end of file
+parser = argparse.ArgumentParser(prog="risk_engine")
+parser.add_argument("--print-recording-interactive", action="store_true", help="Print the length of the recording as the match is played.")
+parser.add_argument("--seed", type=int, default=None, help="Seed for the match's random number generator, a random seed is used if not given.")
+parser.add_argument("--trace", action="store_true", help="Write a Chrome trace event timeline of the match to output/trace.json, also enabled by GAME_ENGINE_TRACE=1.")
+parser.add_argument("--profile", choices=PROFILE_MODES, default=PROFILE_MODE, help="Profile the engine, writing output/engine.prof (cprofile) or output/engine_samples.txt (sampling), also set by GAME_ENGINE_PROFILE.")
+parser.add_argument("--trace-memory", action="store_true", help="Trace the engine's memory allocations with tracemalloc and write output/engine_memory.txt, also enabled by GAME_ENGINE_TRACE_MEMORY=1.")
+parser.add_argument("--games", type=int, default=1, help="Number of games to play back to back over the same player connections, each game's output is written to output/game<k>/.")
+args = parser.parse_args()
+
+profiler = Profiler(get_profile_mode(args.profile), trace_memory=args.trace_memory or TRACE_MEMORY)
+profiler.start()
+try:
+    run_session(args.games, args.print_recording_interactive, seed=args.seed, trace=args.trace or TRACE_MATCH)
+finally:
+    if profiler.enabled:
+        profiler.dump(f"{CORE_DIRECTORY}/output", "engine")
+    profiler.stop()
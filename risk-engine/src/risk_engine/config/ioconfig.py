@@ -1,8 +1,12 @@
 import os
 
+from risk_shared.limits import CUMULATIVE_TIMEOUT_SECONDS, TIMEOUT_SECONDS
+
 
 CORE_DIRECTORY = os.environ["GAME_ENGINE_CORE_DIRECTORY"] if "GAME_ENGINE_CORE_DIRECTORY" in os.environ else "."
-TIMEOUT_SECONDS = 1
-CUMULATIVE_TIMEOUT_SECONDS = 6
 MAX_CHARACTERS_READ = 4096
-READ_CHUNK_SIZE = 1024
\ No newline at end of file
+READ_CHUNK_SIZE = 1024
+VISUALISER_KEYFRAME_INTERVAL = int(os.environ["GAME_ENGINE_KEYFRAME_INTERVAL"]) if "GAME_ENGINE_KEYFRAME_INTERVAL" in os.environ else 100
+TRACE_MATCH = os.environ["GAME_ENGINE_TRACE"] == "1" if "GAME_ENGINE_TRACE" in os.environ else False
+PROFILE_MODE = os.environ["GAME_ENGINE_PROFILE"] if "GAME_ENGINE_PROFILE" in os.environ else None
+TRACE_MEMORY = os.environ["GAME_ENGINE_TRACE_MEMORY"] == "1" if "GAME_ENGINE_TRACE_MEMORY" in os.environ else False
\ No newline at end of file
@@ -1,10 +1,9 @@
 from io import TextIOWrapper
-import itertools
 import json
 import math
 import random
 from signal import SIGALRM, alarm, signal
-from time import time
+from time import perf_counter, time
 from typing import Callable, Literal, Optional, ParamSpec, Type, TypeVar, Union, final
 
 from risk_engine.censoring.censor_record import CensorRecord
@@ -15,6 +14,8 @@ from pydantic import TypeAdapter, ValidationError
 from risk_engine.config.ioconfig import CORE_DIRECTORY, CUMULATIVE_TIMEOUT_SECONDS, MAX_CHARACTERS_READ, READ_CHUNK_SIZE, TIMEOUT_SECONDS
 from risk_engine.exceptions import BrokenPipeException, CumulativeTimeoutException, InvalidMoveException, PlayerException, InvalidMessageException, TimeoutException
 from risk_engine.game.engine_state import EngineState
+from risk_engine.output.metrics import QueryMetrics
+from risk_engine.output.trace_writer import TraceWriter
 from risk_shared.models.player_model import PlayerModel
 from risk_shared.queries.query_type import QueryType
 from risk_shared.records.moves.move_attack_pass import MoveAttackPass
@@ -29,6 +30,7 @@ from risk_shared.queries.query_attack import QueryAttack
 from risk_shared.queries.query_distribute_troops import QueryDistributeTroops
 from risk_shared.queries.query_redeem_cards import QueryRedeemCards
 from risk_shared.queries.query_fortify import QueryFortify
+from risk_shared.queries.query_new_game import QueryNewGame
 from risk_shared.queries.query_troops_after_attack import QueryTroopsAfterAttack
 from risk_shared.records.moves.move_claim_territory import MoveClaimTerritory
 from risk_shared.records.moves.move_claim_territory import MoveClaimTerritory
@@ -44,6 +46,13 @@ from risk_shared.records.record_start_game import RecordStartGame
 cached_type_adapters: dict[frozenset[str], TypeAdapter] = {}
 
 
+def get_union_type_adapter(response_type_1: type, response_type_2: type) -> TypeAdapter:
+    types = frozenset([response_type_1.__name__, response_type_2.__name__])
+    if types not in cached_type_adapters:
+        cached_type_adapters[types] = TypeAdapter(Union[response_type_1, response_type_2])
+    return cached_type_adapters[types]
+
+
 class InvalidMoveError(ValueError):
     def __init__(self, message: str, move: MoveType):
         super().__init__(message)
@@ -127,16 +136,29 @@ T3 = TypeVar("T3", bound=MoveType)
 @final
 class PlayerConnection():
 
-    def __init__(self, player_id: int):
+    def __init__(self, player_id: int, tracer: Optional[TraceWriter] = None):
         self.player_id: int = player_id
+        self.tracer = tracer
         self._to_engine_pipe: TextIOWrapper
         self._from_engine_pipe: TextIOWrapper
         self._cumulative_time: float = 0
         self._record_update_watermark: int = 0
+        self._first_byte_time: float = 0
+        self.metrics = QueryMetrics()
 
         self._open_pipes()
 
 
+    @property
+    def record_update_watermark(self) -> int:
+        return self._record_update_watermark
+
+
+    @property
+    def cumulative_time(self) -> float:
+        return self._cumulative_time
+
+
     @time_limited("You didn't open 'to_engine' for writing or 'from_engine.pipe' for reading in time.")
     def _open_pipes(self):
         self._to_engine_pipe = open(f"{CORE_DIRECTORY}/submission{self.player_id}/io/to_engine.pipe", "r")
@@ -151,8 +173,9 @@ class PlayerConnection():
 
     def _receive(self) -> str:
 
-        # Read size of message.
-        buffer = bytearray()
+        # Read size of message, the first byte marks the end of the player's thinking time.
+        buffer = bytearray(self._to_engine_pipe.read(1).encode())
+        self._first_byte_time = perf_counter()
         while len(buffer) < math.floor(math.log10(MAX_CHARACTERS_READ)) + 1 and (len(buffer) == 0 or buffer[-1] != ord(",")):
             buffer.extend(self._to_engine_pipe.read(1).encode())
 
@@ -172,17 +195,32 @@ class PlayerConnection():
         return buffer.decode()
 
 
+    def _record_timings(self, query: QueryType, started: float, serialized: float, sent: float, received: float, finished: float) -> None:
+        self.metrics.record(query.query_type, started, sent, self._first_byte_time, finished)
+        if self.tracer is not None:
+            self.tracer.trace_query(self.player_id, query.query_type, started, serialized, sent, self._first_byte_time, received, finished)
+
+
     @handle_invalid
     @handle_sigpipe
     @time_limited()
     def _query_move(self, query: QueryType, response_type: Type[T2], validator: MoveValidator) -> T2:
-        self._send(query.model_dump_json())
+        started = perf_counter()
+        data = query.model_dump_json()
+        serialized = perf_counter()
+        self._send(data)
+        sent = perf_counter()
 
-        move = response_type.model_validate_json(self._receive())
+        response = self._receive()
+        received = perf_counter()
+
+        move = response_type.model_validate_json(response)
         try:
             validator.validate(move, query, self.player_id)
         except ValueError as e:
             raise InvalidMoveError(str(e), move)
+
+        self._record_timings(query, started, serialized, sent, received, perf_counter())
         return move
     
 
@@ -190,31 +228,48 @@ class PlayerConnection():
     @handle_sigpipe
     @time_limited()
     def _query_move_union(self, query: QueryType, response_type_1: Type[T2], response_type_2: Type[T3], validator: MoveValidator) -> Union[T2, T3]:
-        self._send(query.model_dump_json())
+        started = perf_counter()
+        data = query.model_dump_json()
+        serialized = perf_counter()
+        self._send(data)
+        sent = perf_counter()
 
-        types = frozenset([response_type_1.__name__, response_type_2.__name__])
-        if types in cached_type_adapters:
-            adapter = cached_type_adapters[types]
-        else:
-            cached_type_adapters[types] = TypeAdapter(Union[response_type_1, response_type_2])
-            adapter = cached_type_adapters[types]
+        adapter = get_union_type_adapter(response_type_1, response_type_2)
         
-        move = adapter.validate_json(self._receive())
+        response = self._receive()
+        received = perf_counter()
+
+        move = adapter.validate_json(response)
         try:
             validator.validate(move, query, self.player_id)
         except ValueError as e:
             raise InvalidMoveError(str(e), move)
+
+        self._record_timings(query, started, serialized, sent, received, perf_counter())
         return move
 
 
     def _get_record_update_dict(self, state: EngineState, censor: CensorRecord):
         if self._record_update_watermark >= len(state.recording):
             raise RuntimeError("Record update watermark out of sync with state, did you try to send two queries without committing the first?")
-        result = dict([(i, censor.censor(x, self.player_id)) for i, x in itertools.islice(enumerate(state.recording), self._record_update_watermark, None)])
+        result = dict([(i, censor.censor(x, self.player_id)) for i, x in state.recording.enumerate_from(self._record_update_watermark)])
         self._record_update_watermark = len(state.recording)
         return result
 
 
+    @handle_sigpipe
+    def start_new_game(self, game: int) -> None:
+        """Tells the player that the next game of a multi-game session is starting, and resets the connection for it.
+        There is no reply, so the next game's first query follows straight after, players must not assume the pipe is
+        empty once they have read this.
+        """
+
+        self._send(QueryNewGame(game=game, update={}).model_dump_json())
+        self._record_update_watermark = 0
+        self._cumulative_time = 0
+        self.metrics = QueryMetrics()
+
+
     def query_claim_territory(self, state: EngineState, validator: MoveValidator, censor: CensorRecord) -> MoveClaimTerritory:
         query = QueryClaimTerritory(update=self._get_record_update_dict(state, censor))
         return self._query_move(query, MoveClaimTerritory, validator)
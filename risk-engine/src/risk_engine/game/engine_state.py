@@ -1,24 +1,31 @@
 import json
+import random
+from typing import Optional
 from risk_engine.config.gameconfig import NUM_PLAYERS, NUM_STARTING_TROOPS
 from risk_engine.config.ioconfig import CORE_DIRECTORY
+from risk_engine.game.recording import Recording
 from risk_shared.maps.map import Map
 from risk_shared.maps import earth
 from risk_shared.models.card_model import CardModel
 from risk_shared.models.player_model import PlayerModel
 from risk_shared.models.territory_model import TerritoryModel
-from risk_shared.records.types.record_type import RecordType
 
 class EngineState():
-    def __init__(self):
-        with open(f"{CORE_DIRECTORY}/input/catalog.json", "r") as f:
-            catalog = json.load(f)
+    def __init__(self, recording_path: Optional[str] = None, catalog: Optional[list[dict]] = None, seed: Optional[int] = None):
+        if catalog is None:
+            with open(f"{CORE_DIRECTORY}/input/catalog.json", "r") as f:
+                catalog = json.load(f)
 
-        self.map: Map = earth.create_map()
-        self.cards: dict[int, CardModel] = dict([(i, card) for i, card in earth.create_cards().items()])
+        self.map: Map = earth.get_map()
+        self.cards: dict[int, CardModel] = earth.get_cards()
         self.deck: list[CardModel] = []
         self.discarded_deck: list[CardModel] = list(self.cards.values())
         self.players: dict[int, PlayerModel] = dict([(x, PlayerModel(player_id=x, team_id=catalog[x]["team_id"], troops_remaining=NUM_STARTING_TROOPS, alive=True, cards=[], must_place_territory_bonus=[])) for x in range(NUM_PLAYERS)])
         self.territories: dict[int, TerritoryModel] = dict([(x, TerritoryModel(territory_id=x, occupier=None, troops=0)) for x in self.map.get_vertices()])
         self.card_sets_redeemed: int = 0
         self.turn_order: list[int] = [x.player_id for x in self.players.values()]
-        self.recording: list[RecordType] = []
\ No newline at end of file
+        self.recording: Recording = Recording(recording_path)
+
+        # All randomness in a match comes from this generator, so a match can be reproduced from its seed.
+        self.seed: int = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.random: random.Random = random.Random(self.seed)
\ No newline at end of file
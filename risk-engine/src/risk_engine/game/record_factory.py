@@ -1,7 +1,6 @@
 
 
 
-import random
 from typing import cast
 from risk_engine.exceptions import BrokenPipeException, CumulativeTimeoutException, InvalidMessageException, InvalidMoveException, PlayerException, TimeoutException
 from risk_engine.game.engine_state import EngineState
@@ -24,7 +23,7 @@ def record_attack_factory(state: EngineState, move_attack_id: int, move_defend_i
     defending_troops = move_defend_obj.defending_troops
 
     def roll():
-        return random.randint(1, 6)
+        return state.random.randint(1, 6)
     
     attacking_rolls = sorted([roll() for _ in range(attacking_troops)])
     defending_rolls = sorted([roll() for _ in range(defending_troops)])
@@ -0,0 +1,70 @@
+from collections import deque
+import itertools
+from typing import Iterator, Optional, Tuple
+
+from risk_engine.output.json_array_writer import JsonArrayWriter
+from risk_shared.records.types.record_type import RecordType
+
+
+class Recording():
+    """The game recording, records are streamed to the recording file as they are appended and only
+    the records which may still be referenced are kept in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._records: deque[RecordType] = deque()
+        self._offset: int = 0
+        self._writer: Optional[JsonArrayWriter] = JsonArrayWriter(path) if path is not None else None
+
+
+    def __len__(self) -> int:
+        return self._offset + len(self._records)
+
+
+    def __getitem__(self, i: int) -> RecordType:
+        if i < 0:
+            i += len(self)
+
+        if not self._offset <= i < len(self):
+            raise IndexError(f"Record {i} is not held in memory, records {self._offset} to {len(self) - 1} are available.")
+
+        return self._records[i - self._offset]
+
+
+    def append(self, record: RecordType) -> None:
+        if self._writer is not None:
+            self._writer.write(record.model_dump_json())
+
+        self._records.append(record)
+
+
+    def enumerate_from(self, start: int) -> Iterator[Tuple[int, RecordType]]:
+        if start < self._offset:
+            raise IndexError(f"Record {start} is not held in memory, records {self._offset} to {len(self) - 1} are available.")
+
+        return enumerate(itertools.islice(self._records, start - self._offset, None), start)
+
+
+    def release(self, before: int) -> None:
+        """Drop the records with ids less than 'before' from memory, the most recent record is always kept.
+        """
+
+        before = min(before, len(self) - 1)
+        while self._offset < before:
+            self._records.popleft()
+            self._offset += 1
+
+
+    def copy(self) -> 'Recording':
+        """Returns an in-memory copy of the records currently held, the copy isn't written anywhere.
+        """
+
+        result = Recording()
+        result._records = self._records.copy()
+        result._offset = self._offset
+        return result
+
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
@@ -1,6 +1,8 @@
-import random
-from typing import TypeGuard, cast
+from time import perf_counter
+from typing import Optional, TypeGuard, cast
 from risk_engine.game.engine_state import EngineState
+from risk_engine.output.recording_inspector import RecordingInspector
+from risk_engine.output.trace_writer import ENGINE_LANE, TraceWriter
 from risk_shared.records.moves.move_attack import MoveAttack
 from risk_shared.records.moves.move_attack_pass import MoveAttackPass
 from risk_shared.records.moves.move_claim_territory import MoveClaimTerritory
@@ -27,11 +29,18 @@ from risk_shared.records.types.record_type import RecordType
 
 class StateMutator():
 
-    def __init__(self, state: EngineState):
+    def __init__(self, state: EngineState, inspector: Optional[RecordingInspector] = None, tracer: Optional[TraceWriter] = None):
         self.state = state
+        self.inspector = inspector
+        self.tracer = tracer
 
     def commit(self, record: RecordType):
+        started = perf_counter()
         self.state.recording.append(record)
+        record_id = len(self.state.recording) - 1
+
+        if self.inspector is not None:
+            self.inspector.inspect(record_id, record)
 
         match record:
             case MoveAttack() as r:
@@ -78,6 +87,12 @@ class StateMutator():
                 self._commit_record_cancelled(r)
             case _:
                 raise NotImplementedError
+
+        if self.inspector is not None:
+            self.inspector.inspect_committed(record_id, record)
+
+        if self.tracer is not None:
+            self.tracer.complete(f"commit {record.record_type}", "commit", ENGINE_LANE, started, perf_counter(), {"record_id": record_id})
             
 
     def _commit_move_attack(self, r: MoveAttack) -> None:
@@ -217,7 +232,7 @@ class StateMutator():
             raise RuntimeError("Shuffled cards before deck was empty.")
 
         self.state.deck = self.state.discarded_deck
-        random.shuffle(self.state.deck)
+        self.state.random.shuffle(self.state.deck)
         self.state.discarded_deck = []
 
 
@@ -1,11 +1,12 @@
-import random
+from contextlib import AbstractContextManager, nullcontext
+import json
 import shutil
-from typing import Tuple
+from typing import Any, Optional, Tuple
 from collections import deque
 
 from risk_engine.censoring.censor_record import CensorRecord
 from risk_engine.config.gameconfig import MAX_GAME_RECORDING_SIZE
-from risk_engine.config.ioconfig import CORE_DIRECTORY
+from risk_engine.config.ioconfig import CORE_DIRECTORY, CUMULATIVE_TIMEOUT_SECONDS, TIMEOUT_SECONDS
 from risk_engine.connection.player_connection import PlayerConnection
 from risk_engine.exceptions import PlayerException
 from risk_engine.game.record_factory import record_attack_factory, record_banned_factory, record_drew_card_factory, record_player_eliminated_factory, record_start_turn_factory
@@ -13,8 +14,10 @@ from risk_engine.game.engine_state import EngineState
 from risk_engine.game.state_mutator import StateMutator
 from risk_engine.output.game_result import GameBanResult, GameCancelledResult, GameSuccessResult
 from risk_engine.output.recording_inspector import RecordingInspector
+from risk_engine.output.trace_writer import TraceWriter
 from risk_engine.validation.move_validator import MoveValidator
 from risk_shared.models.player_model import PlayerModel
+from risk_shared.queries.build_queries import build_query_models
 from risk_shared.records.moves.move_attack_pass import MoveAttackPass
 from risk_shared.records.record_cancelled import RecordCancelled
 from risk_shared.records.record_shuffled_cards import RecordShuffledCards
@@ -37,17 +40,28 @@ def get_next_turn(state: EngineState, connections: dict[int, PlayerConnection],
 
 
 class GameEngine:
-    def __init__(self, print_recording_interactive: bool=False):
-        self.state = EngineState()
-        self.mutator = StateMutator(self.state)
+    def __init__(self, print_recording_interactive: bool=False, seed: Optional[int] = None, trace: bool = False, output_directory: str = f"{CORE_DIRECTORY}/output", connections: Optional[dict[int, PlayerConnection]] = None):
+        # Build the queries now rather than while timing the players' first queries.
+        build_query_models()
+
+        self.output_directory = output_directory
+        self.state = EngineState(recording_path=f"{output_directory}/game.json", seed=seed)
+        self.inspector = RecordingInspector(self.state, output_directory=output_directory)
+        self.tracer = TraceWriter(f"{output_directory}/trace.json", list(self.state.players.keys())) if trace else None
+        self.mutator = StateMutator(self.state, self.inspector, self.tracer)
         self.validator = MoveValidator(self.state)
         self.censor = CensorRecord(self.state)
-        self.connections: dict[int, PlayerConnection]
         self.print_recording_interactive = print_recording_interactive
 
+        # Connections are reused from the previous game in a multi-game session.
+        self.connections: dict[int, PlayerConnection] = connections if connections is not None else {}
+        for connection in self.connections.values():
+            connection.tracer = self.tracer
+
     def start(self):
         try:
-            self._connect()
+            if len(self.connections) == 0:
+                self._connect()
             self._run_game()
         except PlayerException as e:
             record = record_banned_factory(e)
@@ -58,35 +72,52 @@ class GameEngine:
 
 
     def _connect(self):
-        self.connections = dict([(x, PlayerConnection(player_id=x)) for x in self.state.players.keys()])
+        self.connections = dict([(x, PlayerConnection(player_id=x, tracer=self.tracer)) for x in self.state.players.keys()])
+
+
+    def _trace(self, name: str, args: Optional[dict[str, Any]] = None) -> AbstractContextManager[None]:
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.span(name, "phase", args=args)
+
+
+    def _release_records(self):
+        # Records that every player still in the game has been sent are already in the game log,
+        # and no record refers back past them, so they don't need to be kept in memory.
+        watermarks = [connection.record_update_watermark for player_id, connection in self.connections.items() if self.state.players[player_id].alive]
+        self.state.recording.release(min(watermarks, default=len(self.state.recording)))
 
 
     def _finish(self):
 
+        # Finish the game log and the visualiser differential and keyframe logs, these were written
+        # as the game was played.
+        self.state.recording.close()
+        self.inspector.close()
+        if self.tracer is not None:
+            self.tracer.close()
+
         # Write the result.
-        inspector = RecordingInspector(self.state.recording)
-        result = inspector.get_result()
+        result = self.inspector.get_result()
 
-        with open(f"{CORE_DIRECTORY}/output/results.json", "w") as f:
+        with open(f"{self.output_directory}/results.json", "w") as f:
             f.write(result.model_dump_json())
 
-        # Write the game log.
-        with open(f"{CORE_DIRECTORY}/output/game.json", "w") as f:
-            f.write(inspector.get_recording_json())
+        # Write the query latency histograms for each player, latencies are in microseconds.
+        metrics = {
+            "timeout_seconds": TIMEOUT_SECONDS,
+            "cumulative_timeout_seconds": CUMULATIVE_TIMEOUT_SECONDS,
+            "players": dict([(player_id, {"cumulative_seconds": connection.cumulative_time, "queries": connection.metrics.to_json()}) for player_id, connection in self.connections.items()])
+        }
 
-        # Write the visualiser forward and backwards differential logs.
-        forwards_differential, backwards_differential = inspector.get_visualiser_forwards_backwards_differential_json()
-        with open(f"{CORE_DIRECTORY}/output/visualiser_forwards_differential.json", "w") as f:
-            f.write(forwards_differential)
-        
-        with open(f"{CORE_DIRECTORY}/output/visualiser_backwards_differential.json", "w") as f:
-            f.write(backwards_differential)
+        with open(f"{self.output_directory}/metrics.json", "w") as f:
+            json.dump(metrics, f)
 
         def copy_stdout_stderr_player(player: int):
             stderr_path = f"{CORE_DIRECTORY}/submission{player}/io/submission.err"
-            stderr_path_new = f"{CORE_DIRECTORY}/output/submission_{player}.err"
+            stderr_path_new = f"{self.output_directory}/submission_{player}.err"
             stdout_path = f"{CORE_DIRECTORY}/submission{player}/io/submission.log"
-            stdout_path_new = f"{CORE_DIRECTORY}/output/submission_{player}.log"
+            stdout_path_new = f"{self.output_directory}/submission_{player}.log"
 
             try:
                 shutil.copy(stderr_path, stderr_path_new, follow_symlinks=False)
@@ -119,7 +150,7 @@ class GameEngine:
         
         # Emit RecordStartGame.
         turn_order = list(self.state.players.keys())
-        random.shuffle(turn_order)
+        self.state.random.shuffle(turn_order)
         self.state.turn_order = turn_order
         record_start_game = RecordStartGame(turn_order=self.state.turn_order.copy(), players=[PlayerModel.model_validate(x.model_dump()) for x in self.state.players.values()])
         self.mutator.commit(record_start_game)
@@ -129,8 +160,10 @@ class GameEngine:
         self.mutator.commit(record_shuffled_cards)
 
         # Run the initial phases.
-        self._start_claim_territories_phase()
-        self._start_place_initial_troops_phase()
+        with self._trace("claim_territories"):
+            self._start_claim_territories_phase()
+        with self._trace("place_initial_troops"):
+            self._start_place_initial_troops_phase()
 
         # Run the main game.
         turn_order = deque(self.state.turn_order.copy())
@@ -144,13 +177,18 @@ class GameEngine:
                 break
             
             player, connection = get_next_turn(self.state, self.connections, turn_order)
+            self._release_records()
 
-            self._troop_phase(player, connection)
-            self._attack_phase(player, connection)
+            with self._trace("turn", {"player": player.player_id}):
+                with self._trace("troop"):
+                    self._troop_phase(player, connection)
+                with self._trace("attack"):
+                    self._attack_phase(player, connection)
 
-            # Don't bother with fortify phase if game has already ended.
-            if len(list(filter(lambda x: x.alive == True, self.state.players.values()))) > 1:
-                self._fortify_phase(player, connection)
+                # Don't bother with fortify phase if game has already ended.
+                if len(list(filter(lambda x: x.alive == True, self.state.players.values()))) > 1:
+                    with self._trace("fortify"):
+                        self._fortify_phase(player, connection)
 
         # If the game was terminated due to taking too long, cancel the match.
         if cancelled:
@@ -170,6 +208,7 @@ class GameEngine:
 
         while len(list(filter(lambda x: x.occupier == None, self.state.territories.values()))) > 0:
             player, connection = get_next_turn(self.state, self.connections, turn_order)
+            self._release_records()
             response = connection.query_claim_territory(self.state, self.validator, self.censor)
             self.mutator.commit(response)
 
@@ -183,6 +222,7 @@ class GameEngine:
             if player.troops_remaining == 0:
                 continue
 
+            self._release_records()
             response = connection.query_place_initial_troop(self.state, self.validator, self.censor)
             self.mutator.commit(response)
 
@@ -213,6 +253,9 @@ class GameEngine:
                 abort_early = True
                 break
 
+            # Records from earlier attacks are no longer referenced.
+            self._release_records()
+
             # Get the attack move.
             attack = connection.query_attack(self.state, self.validator, self.censor)
             self.mutator.commit(attack)
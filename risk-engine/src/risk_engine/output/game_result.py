@@ -1,4 +1,4 @@
-from typing import Literal
+from typing import Literal, Optional
 from pydantic import BaseModel
 
 from risk_shared.output.ban_type import BanType
@@ -8,17 +8,21 @@ class GameBanResult(BaseModel):
     ban_type: BanType
     player: int
     reason: str
+    seed: Optional[int] = None
 
 
 class GameSuccessResult(BaseModel):
     result_type: Literal["SUCCESS"] = "SUCCESS"
     ranking: list[int]
+    seed: Optional[int] = None
 
 
 class GameCancelledResult(BaseModel):
     result_type: Literal["CANCELLED"] = "CANCELLED"
     reason: str
+    seed: Optional[int] = None
 
 class GameCrashedResult(BaseModel):
     result_type: Literal["CRASHED"] = "CRASHED"
-    reason: str
\ No newline at end of file
+    reason: str
+    seed: Optional[int] = None
\ No newline at end of file
@@ -0,0 +1,30 @@
+from io import TextIOWrapper
+
+
+class JsonArrayWriter():
+    """Writes a JSON array to a file one element at a time, the array is valid JSON once closed.
+
+    'position' is the number of characters written so far, which is the byte offset in the file when
+    only ASCII is written.
+    """
+
+    def __init__(self, path: str):
+        self._file: TextIOWrapper = open(path, "w")
+        self._file.write("[")
+        self._empty = True
+        self.position: int = 1
+
+
+    def write(self, element_json: str) -> None:
+        if not self._empty:
+            self._file.write(",")
+            self.position += 1
+        self._file.write(element_json)
+        self.position += len(element_json)
+        self._empty = False
+
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.write("]")
+            self._file.close()
@@ -0,0 +1,100 @@
+from collections import defaultdict
+from typing import Any
+
+
+QUERY_STAGES = ["send", "wait", "receive_validate"]
+
+
+class LatencyHistogram():
+    """An HDR-style histogram of latencies in microseconds.
+
+    Values below 2^sub_bucket_bits are counted exactly, larger values are counted in buckets whose width
+    doubles with each power of two, keeping the top 'sub_bucket_bits' bits of the value. The relative error
+    of any value read back is therefore below 2^-(sub_bucket_bits - 1), under 1% by default, while the
+    histogram stays small no matter the range of values recorded.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 8):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+        self._counts: dict[int, int] = defaultdict(int)
+
+
+    def _get_index(self, value: int) -> int:
+        shift = max(value.bit_length() - self.sub_bucket_bits, 0)
+        return (shift << (self.sub_bucket_bits - 1)) + (value >> shift)
+
+
+    def _get_bucket(self, index: int) -> tuple[int, int]:
+        """Returns the lowest and highest values counted by the bucket at 'index'.
+        """
+
+        shift = max((index >> (self.sub_bucket_bits - 1)) - 1, 0)
+        lowest = (index - (shift << (self.sub_bucket_bits - 1))) << shift
+        return (lowest, lowest + (1 << shift) - 1)
+
+
+    def record(self, seconds: float) -> None:
+        value = max(round(seconds * 1_000_000), 0)
+        self.min = value if self.count == 0 else min(self.min, value)
+        self.max = max(self.max, value)
+        self.count += 1
+        self.total += value
+        self._counts[self._get_index(value)] += 1
+
+
+    def get_percentile(self, percentile: float) -> int:
+        """Returns the highest value equivalent to the value at 'percentile' (0 to 100), in microseconds.
+        """
+
+        if self.count == 0:
+            return 0
+
+        target = max(1, round(self.count * percentile / 100))
+        seen = 0
+        for index in sorted(self._counts.keys()):
+            seen += self._counts[index]
+            if seen >= target:
+                return min(self._get_bucket(index)[1], self.max)
+
+        return self.max
+
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "min": self.min,
+            "mean": self.total / self.count if self.count > 0 else 0,
+            "p50": self.get_percentile(50),
+            "p90": self.get_percentile(90),
+            "p99": self.get_percentile(99),
+            "p99.9": self.get_percentile(99.9),
+            "max": self.max,
+            "buckets": [[self._get_bucket(index)[0], self._counts[index]] for index in sorted(self._counts.keys())],
+        }
+
+
+class QueryMetrics():
+    """Latency histograms for each query type sent to a player, split into the stages of a query:
+
+    send: serialising the query and writing it to the player's pipe.
+    wait: waiting for the first byte of the player's response, which is the player's thinking time.
+    receive_validate: reading the rest of the response, then parsing and validating the move.
+    """
+
+    def __init__(self):
+        self.histograms: dict[str, dict[str, LatencyHistogram]] = defaultdict(lambda: dict([(stage, LatencyHistogram()) for stage in QUERY_STAGES]))
+
+
+    def record(self, query_type: str, started: float, sent: float, first_byte: float, finished: float) -> None:
+        histograms = self.histograms[query_type]
+        histograms["send"].record(sent - started)
+        histograms["wait"].record(first_byte - sent)
+        histograms["receive_validate"].record(finished - first_byte)
+
+
+    def to_json(self) -> dict[str, Any]:
+        return dict([(query_type, dict([(stage, histogram.to_json()) for stage, histogram in histograms.items()])) for query_type, histograms in sorted(self.histograms.items())])
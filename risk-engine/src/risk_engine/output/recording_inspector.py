@@ -1,10 +1,12 @@
 
 
-from typing import Tuple, Union, cast
+import json
+from typing import Optional, Union, cast
 
-from pydantic import RootModel
+from risk_engine.config.ioconfig import VISUALISER_KEYFRAME_INTERVAL
+from risk_engine.game.engine_state import EngineState
 from risk_engine.output.game_result import GameBanResult, GameCancelledResult, GameCrashedResult, GameSuccessResult
-from risk_shared.maps import earth
+from risk_engine.output.json_array_writer import JsonArrayWriter
 from risk_shared.models.territory_model import TerritoryModel
 from risk_shared.records.moves.move_attack import MoveAttack
 from risk_shared.records.moves.move_claim_territory import MoveClaimTerritory
@@ -21,159 +23,151 @@ from risk_shared.records.record_winner import RecordWinner
 from risk_shared.records.types.record_type import RecordType
 
 
-class RecordingInspector():
-
-    def __init__(self, recording: list[RecordType]):
-        self.recording = recording
+FORWARDS_DIFFERENTIAL_FILE = "visualiser_forwards_differential.json"
+BACKWARDS_DIFFERENTIAL_FILE = "visualiser_backwards_differential.json"
+KEYFRAMES_FILE = "visualiser_keyframes.json"
+KEYFRAMES_INDEX_FILE = "visualiser_keyframes_index.json"
 
 
-    def _get_ranking(self) -> list[int]:
-        ranking = []
-        for record in self.recording:
-            match record:
-                case RecordPlayerEliminated() as x:
-                    ranking.append(x.player)
-                case RecordWinner() as x:
-                    ranking.append(x.player)
-
-        return ranking[::-1]
+def territory_json(territory: TerritoryModel) -> str:
+    occupier = "null" if territory.occupier is None else territory.occupier
+    return f'{{"territory_id":{territory.territory_id},"occupier":{occupier},"troops":{territory.troops}}}'
 
 
-    def get_result(self) -> Union[GameBanResult, GameSuccessResult, GameCancelledResult, GameCrashedResult]:
-        match self.recording[-1]:
-            case RecordCancelled() as x:
-                return GameCancelledResult(reason=x.reason)
-            case RecordBanned() as x:
-                return GameBanResult(ban_type=x.ban_type, player=x.player, reason=x.reason)
+class RecordingInspector():
+    """Inspects records as they are committed to the state, tracking the result of the game and writing
+    the visualiser differentials.
+
+    The StateMutator calls 'inspect' before a record is applied to the state and 'inspect_committed' after,
+    so the backwards differential is written from the territories before the record and the forwards
+    differential from the territories after it.
+
+    Every 'keyframe_interval' records a keyframe of the whole board is also written, along with an index of
+    the keyframes' offsets and the offsets into the forwards differential following them, so the board at
+    any record can be found without stepping through the differential from the start (see VisualiserSeeker).
+    Keyframes are written in record order, the keyframe for a record is taken when the next record is inspected,
+    since a record committed while committing another (the RecordRedeemedCards of a MoveRedeemCards) is
+    committed before it.
+    """
+
+    def __init__(self, state: EngineState, output_directory: Optional[str] = None, keyframe_interval: int = VISUALISER_KEYFRAME_INTERVAL):
+        if keyframe_interval <= 0:
+            raise ValueError(f"The visualiser keyframe interval must be positive, got {keyframe_interval} (see GAME_ENGINE_KEYFRAME_INTERVAL).")
+
+        self.state = state
+        self.output_directory = output_directory
+        self.keyframe_interval = keyframe_interval
+        self._ranking: list[int] = []
+        self._forwards_differential: Optional[JsonArrayWriter] = None
+        self._backwards_differential: Optional[JsonArrayWriter] = None
+        self._keyframes: Optional[JsonArrayWriter] = None
+        self._keyframes_index: list[tuple[int, int, int]] = []
+
+        if output_directory is not None:
+            self._forwards_differential = JsonArrayWriter(f"{output_directory}/{FORWARDS_DIFFERENTIAL_FILE}")
+            self._backwards_differential = JsonArrayWriter(f"{output_directory}/{BACKWARDS_DIFFERENTIAL_FILE}")
+            self._keyframes = JsonArrayWriter(f"{output_directory}/{KEYFRAMES_FILE}")
+
+
+    def inspect(self, i: int, record: RecordType) -> None:
+        match record:
+            case RecordPlayerEliminated() as x:
+                self._ranking.append(x.player)
             case RecordWinner() as x:
-                return GameSuccessResult(ranking=self._get_ranking())
-            case _:
-                return GameCrashedResult(reason="Game engine crashed.")
-            
-
-    def get_recording_json(self) -> str:
-        return RootModel(self.recording).model_dump_json()
-    
-
-    def get_visualiser_forwards_backwards_differential_json(self) -> Tuple[str, str]:
-        
-        earth_map = earth.create_map()
-        territories = dict([(x, TerritoryModel(territory_id=x, occupier=None, troops=0)) for x in earth_map.get_vertices()])
-
-        forwards_differential: list[Tuple[int, list[TerritoryModel]]] = []
-        backwards_differential: list[Tuple[int, list[TerritoryModel]]] = []
-
-
-        for i, record in enumerate(self.recording):
-            match record:
-                case RecordStartGame() as r:
-                    backwards_differential.append((i, []))
-
-                case MoveClaimTerritory() as r:
-                    territory_old = territories[r.territory].model_copy()
-                    territory_new = territory_old.model_copy()
-
-                    territory_new.occupier = r.move_by_player
-                    territory_new.troops = 1
+                self._ranking.append(x.player)
 
-                    backwards_differential.append((i, [territory_old]))
-                    forwards_differential.append((i, [territory_new]))
+        if self._backwards_differential is None:
+            return
 
-                    territories[territory_new.territory_id] = territory_new
+        # The board before this record is the board after the previous one.
+        self._write_keyframe(i - 1)
 
+        match record:
+            case RecordStartGame():
+                self._backwards_differential.write(f"[{i},[]]")
+            case _:
+                changed_territories = self._get_changed_territories(record)
+                if changed_territories is not None:
+                    self._backwards_differential.write(self._get_differential_json(i, changed_territories))
 
-                case MoveDistributeTroops() as r:
-                    territories_old = [territories[territory].model_copy() for territory in r.distributions.keys()]
-                    territories_new = dict([(territory.territory_id, territory.model_copy()) for territory in territories_old])
-
-                    for key, value in r.distributions.items():
-                        territories_new[key].troops += value
-
-                    backwards_differential.append((i, territories_old))
-                    forwards_differential.append((i, list(territories_new.values())))
-
-                    for territory in territories_new.values():
-                        territories[territory.territory_id] = territory
-
-
-                case MoveFortify() as r:
-                    source_territory_old = territories[r.source_territory].model_copy()
-                    target_territory_old = territories[r.target_territory].model_copy()
-                    source_territory_new = source_territory_old.model_copy()
-                    target_territory_new = target_territory_old.model_copy()
-
-                    source_territory_new.troops -= r.troop_count
-                    target_territory_new.troops += r.troop_count
-
-                    backwards_differential.append((i, [source_territory_old, target_territory_old]))
-                    forwards_differential.append((i, [source_territory_new, target_territory_new]))
-
-                    territories[source_territory_new.territory_id] = source_territory_new
-                    territories[target_territory_new.territory_id] = target_territory_new
 
+    def inspect_committed(self, i: int, record: RecordType) -> None:
+        if self._forwards_differential is None or self._keyframes is None:
+            return
 
-                case MovePlaceInitialTroop() as r:
-                    territory_old = territories[r.territory].model_copy()
-                    territory_new = territory_old.model_copy()
+        match record:
+            case RecordBanned() | RecordCancelled() | RecordWinner():
+                self._forwards_differential.write(f"[{i},[]]")
+            case _:
+                changed_territories = self._get_changed_territories(record)
+                if changed_territories is not None:
+                    self._forwards_differential.write(self._get_differential_json(i, changed_territories))
 
-                    territory_new.troops += 1
 
-                    backwards_differential.append((i, [territory_old]))
-                    forwards_differential.append((i, [territory_new]))
+    def _write_keyframe(self, i: int) -> None:
+        if self._forwards_differential is None or self._keyframes is None or i < 0 or i % self.keyframe_interval != 0:
+            return
 
-                    territories[territory_new.territory_id] = territory_new
+        self._keyframes_index.append((i, self._keyframes.position, self._forwards_differential.position))
+        self._keyframes.write(self._get_differential_json(i, list(self.state.territories.keys())))
 
 
-                case MoveTroopsAfterAttack() as r:
-                    record_attack = cast(RecordAttack, self.recording[r.record_attack_id])
-                    move_attack = cast(MoveAttack, self.recording[record_attack.move_attack_id])
+    def _get_changed_territories(self, record: RecordType) -> Optional[list[int]]:
+        match record:
+            case MoveClaimTerritory() as r:
+                return [r.territory]
 
-                    attacking_territory_old = territories[move_attack.attacking_territory].model_copy()
-                    defending_territory_old = territories[move_attack.defending_territory].model_copy()
-                    attacking_territory_new = attacking_territory_old.model_copy()
-                    defending_territory_new = defending_territory_old.model_copy()
+            case MoveDistributeTroops() as r:
+                return list(r.distributions.keys())
 
-                    attacking_territory_new.troops -= r.troop_count
-                    defending_territory_new.troops += r.troop_count
+            case MoveFortify() as r:
+                return [r.source_territory, r.target_territory]
 
-                    backwards_differential.append((i, [attacking_territory_old, defending_territory_old]))
-                    forwards_differential.append((i, [attacking_territory_new, defending_territory_new]))
-                    
-                    territories[attacking_territory_new.territory_id] = attacking_territory_new
-                    territories[defending_territory_new.territory_id] = defending_territory_new
+            case MovePlaceInitialTroop() as r:
+                return [r.territory]
 
+            case MoveTroopsAfterAttack() as r:
+                record_attack = cast(RecordAttack, self.state.recording[r.record_attack_id])
+                move_attack = cast(MoveAttack, self.state.recording[record_attack.move_attack_id])
+                return [move_attack.attacking_territory, move_attack.defending_territory]
 
-                case RecordAttack() as r:
-                    move_attack = cast(MoveAttack, self.recording[r.move_attack_id])
+            case RecordAttack() as r:
+                move_attack = cast(MoveAttack, self.state.recording[r.move_attack_id])
+                return [move_attack.attacking_territory, move_attack.defending_territory]
 
-                    attacking_territory_old = territories[move_attack.attacking_territory].model_copy()
-                    defending_territory_old = territories[move_attack.defending_territory].model_copy()
-                    attacking_territory_new = attacking_territory_old.model_copy()
-                    defending_territory_new = defending_territory_old.model_copy()
+        return None
 
-                    attacking_territory_new.troops -= r.attacking_troops_lost
-                    defending_territory_new.troops -= r.defending_troops_lost
 
-                    if r.territory_conquered:
-                        defending_territory_new.occupier = move_attack.move_by_player
+    def _get_differential_json(self, i: int, territories: list[int]) -> str:
+        return f"[{i},[{','.join([territory_json(self.state.territories[x]) for x in territories])}]]"
 
-                    backwards_differential.append((i, [attacking_territory_old, defending_territory_old]))
-                    forwards_differential.append((i, [attacking_territory_new, defending_territory_new]))
 
-                    territories[attacking_territory_new.territory_id] = attacking_territory_new
-                    territories[defending_territory_new.territory_id] = defending_territory_new
+    def _get_ranking(self) -> list[int]:
+        return self._ranking[::-1]
 
 
-                case RecordBanned() as r:
-                    forwards_differential.append((i, []))
+    def get_result(self) -> Union[GameBanResult, GameSuccessResult, GameCancelledResult, GameCrashedResult]:
+        match self.state.recording[-1]:
+            case RecordCancelled() as x:
+                return GameCancelledResult(reason=x.reason, seed=self.state.seed)
+            case RecordBanned() as x:
+                return GameBanResult(ban_type=x.ban_type, player=x.player, reason=x.reason, seed=self.state.seed)
+            case RecordWinner() as x:
+                return GameSuccessResult(ranking=self._get_ranking(), seed=self.state.seed)
+            case _:
+                return GameCrashedResult(reason="Game engine crashed.", seed=self.state.seed)
 
 
-                case RecordCancelled() as r:
-                    forwards_differential.append((i, []))
+    def close(self) -> None:
+        if self._forwards_differential is not None:
+            self._forwards_differential.close()
 
+        if self._backwards_differential is not None:
+            self._backwards_differential.close()
 
-                case RecordWinner() as r:
-                    forwards_differential.append((i, []))
+        if self._keyframes is not None:
+            self._write_keyframe(len(self.state.recording) - 1)
+            self._keyframes.close()
 
-        
-        return (RootModel(forwards_differential).model_dump_json(), RootModel(backwards_differential).model_dump_json())
\ No newline at end of file
+            with open(f"{self.output_directory}/{KEYFRAMES_INDEX_FILE}", "w") as f:
+                json.dump({"interval": self.keyframe_interval, "keyframes": self._keyframes_index}, f, separators=(",", ":"))
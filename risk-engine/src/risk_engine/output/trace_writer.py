@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+import json
+from time import perf_counter
+from typing import Any, Iterator, Optional
+
+from risk_engine.output.json_array_writer import JsonArrayWriter
+
+
+ENGINE_LANE = 0
+
+
+def player_lane(player_id: int) -> int:
+    return player_id + 1
+
+
+class TraceWriter():
+    """Writes a timeline of the match in the Chrome trace event format, which can be opened in
+    chrome://tracing or https://ui.perfetto.dev.
+
+    The engine's phases and record commits are drawn on the engine lane, and each query is drawn on
+    the lane of the player it was sent to, split into serialising the query, writing it to the pipe,
+    the player thinking, reading the response and validating the move. Events are streamed to the file
+    as they finish, timestamps are in microseconds from when the writer was created.
+    """
+
+    def __init__(self, path: str, players: list[int]):
+        self._writer = JsonArrayWriter(path)
+        self._start = perf_counter()
+
+        self._write_metadata("process_name", ENGINE_LANE, {"name": "risk_engine"})
+        self._write_metadata("thread_name", ENGINE_LANE, {"name": "engine"})
+        self._write_metadata("thread_sort_index", ENGINE_LANE, {"sort_index": ENGINE_LANE})
+        for player_id in players:
+            self._write_metadata("thread_name", player_lane(player_id), {"name": f"player {player_id}"})
+            self._write_metadata("thread_sort_index", player_lane(player_id), {"sort_index": player_lane(player_id)})
+
+
+    def _write_metadata(self, name: str, lane: int, args: dict[str, Any]) -> None:
+        self._writer.write(json.dumps({"name": name, "ph": "M", "pid": 0, "tid": lane, "args": args}))
+
+
+    def _microseconds(self, timestamp: float) -> float:
+        return round((timestamp - self._start) * 1_000_000, 3)
+
+
+    def complete(self, name: str, category: str, lane: int, start: float, end: float, args: Optional[dict[str, Any]] = None) -> None:
+        """Writes an event spanning 'start' to 'end', which are perf_counter() timestamps.
+        """
+
+        event: dict[str, Any] = {"name": name, "cat": category, "ph": "X", "pid": 0, "tid": lane, "ts": self._microseconds(start), "dur": self._microseconds(end) - self._microseconds(start)}
+        if args is not None:
+            event["args"] = args
+        self._writer.write(json.dumps(event))
+
+
+    @contextmanager
+    def span(self, name: str, category: str, lane: int = ENGINE_LANE, args: Optional[dict[str, Any]] = None) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.complete(name, category, lane, start, perf_counter(), args)
+
+
+    def trace_query(self, player_id: int, query_type: str, started: float, serialized: float, sent: float, first_byte: float, received: float, finished: float) -> None:
+        lane = player_lane(player_id)
+        self.complete(query_type, "query", lane, started, finished)
+        self.complete("serialize", "query", lane, started, serialized)
+        self.complete("write", "query", lane, serialized, sent)
+        self.complete("think", "player", lane, sent, first_byte)
+        self.complete("read", "query", lane, first_byte, received)
+        self.complete("validate", "query", lane, received, finished)
+
+
+    def close(self) -> None:
+        self._writer.close()
@@ -0,0 +1,74 @@
+from bisect import bisect_right
+import json
+from typing import Any, Iterator, Optional
+
+from risk_engine.output.recording_inspector import FORWARDS_DIFFERENTIAL_FILE, KEYFRAMES_FILE, KEYFRAMES_INDEX_FILE
+from risk_shared.models.territory_model import TerritoryModel
+
+
+def decode_array_elements(data: str) -> Iterator[Any]:
+    """Decodes the consecutive elements of a slice of a JSON array, skipping the separating commas and the closing bracket.
+    """
+
+    decoder = json.JSONDecoder()
+    i = 0
+    while i < len(data):
+        if data[i] in ",]":
+            i += 1
+            continue
+
+        element, i = decoder.raw_decode(data, i)
+        yield element
+
+
+class VisualiserSeeker():
+    """Finds the board at any record of a finished game from the visualiser keyframes written by the
+    RecordingInspector, by loading the nearest keyframe at or before the record and then applying at
+    most one keyframe interval of the forwards differential.
+    """
+
+    def __init__(self, output_directory: str):
+        with open(f"{output_directory}/{KEYFRAMES_INDEX_FILE}", "r") as f:
+            index = json.load(f)
+
+        self.interval: int = index["interval"]
+        if self.interval <= 0:
+            raise ValueError(f"The keyframe index has an interval of {self.interval}, it must be positive.")
+        self._keyframes: list[tuple[int, int, int]] = [tuple(x) for x in index["keyframes"]]
+        self._keyframe_ids: list[int] = [x[0] for x in self._keyframes]
+        self._keyframes_path = f"{output_directory}/{KEYFRAMES_FILE}"
+        self._forwards_differential_path = f"{output_directory}/{FORWARDS_DIFFERENTIAL_FILE}"
+
+
+    def _read(self, path: str, start: int, end: Optional[int]) -> str:
+        with open(path, "rb") as f:
+            f.seek(start)
+            return f.read(-1 if end is None else end - start).decode()
+
+
+    def get_territories(self, record_id: int) -> dict[int, TerritoryModel]:
+        """Returns the territories after the record with id 'record_id' was committed.
+        """
+
+        k = bisect_right(self._keyframe_ids, record_id) - 1
+        if k < 0:
+            raise IndexError(f"There is no keyframe at or before record {record_id}.")
+
+        next_keyframe = self._keyframes[k + 1] if k + 1 < len(self._keyframes) else None
+        _, keyframe_offset, forwards_differential_offset = self._keyframes[k]
+
+        # Load the keyframe.
+        keyframe_data = self._read(self._keyframes_path, keyframe_offset, next_keyframe[1] if next_keyframe is not None else None)
+        _, keyframe = next(decode_array_elements(keyframe_data))
+        territories = dict([(x["territory_id"], TerritoryModel.model_validate(x)) for x in keyframe])
+
+        # Apply the forwards differential up to the record.
+        differential_data = self._read(self._forwards_differential_path, forwards_differential_offset, next_keyframe[2] if next_keyframe is not None else None)
+        for i, changes in decode_array_elements(differential_data):
+            if i > record_id:
+                break
+
+            for territory in changes:
+                territories[territory["territory_id"]] = TerritoryModel.model_validate(territory)
+
+        return territories
@@ -0,0 +1,151 @@
+from bisect import bisect_right
+import copy
+from typing import Annotated, Union, cast
+
+from pydantic import Field, TypeAdapter
+from risk_engine.game.engine_state import EngineState
+from risk_engine.game.state_mutator import StateMutator
+from risk_shared.records.moves.move_attack import MoveAttack
+from risk_shared.records.moves.move_attack_pass import MoveAttackPass
+from risk_shared.records.record_attack import RecordAttack
+from risk_shared.records.record_banned import RecordBanned
+from risk_shared.records.record_cancelled import RecordCancelled
+from risk_shared.records.record_drew_card import RecordDrewCard
+from risk_shared.records.record_player_eliminated import RecordPlayerEliminated
+from risk_shared.records.record_redeemed_cards import RecordRedeemedCards
+from risk_shared.records.record_shuffled_cards import RecordShuffledCards
+from risk_shared.records.record_start_game import RecordStartGame
+from risk_shared.records.record_start_turn import RecordStartTurn
+from risk_shared.records.record_territory_conquered import RecordTerritoryConquered
+from risk_shared.records.record_winner import RecordWinner
+from risk_shared.records.types.move_type import MoveType
+from risk_shared.records.types.record_type import RecordType
+
+
+# The engine only writes uncensored records to the game log, so the record type alone decides how to decode a record.
+EngineRecordType = Annotated[Union[RecordAttack, RecordBanned, RecordCancelled, RecordDrewCard, RecordPlayerEliminated,
+                                   RecordRedeemedCards, RecordShuffledCards, RecordStartGame, RecordStartTurn,
+                                   RecordTerritoryConquered, RecordWinner, MoveType], Field(discriminator="record_type")]
+recording_adapter = TypeAdapter(list[EngineRecordType])
+
+
+def copy_state(state: EngineState) -> EngineState:
+    """Copies the parts of the state that are changed by committing records, the map and cards are shared.
+    """
+
+    result = copy.copy(state)
+    result.deck = list(state.deck)
+    result.discarded_deck = list(state.discarded_deck)
+    result.players = dict([(x, y.model_copy(deep=True)) for x, y in state.players.items()])
+    result.territories = dict([(x, y.model_copy()) for x, y in state.territories.items()])
+    result.turn_order = list(state.turn_order)
+    result.recording = state.recording.copy()
+    return result
+
+
+class ReplayStateMutator(StateMutator):
+    """A StateMutator that orders the deck on each shuffle so cards are drawn in the order the game log says they were,
+    rather than shuffling randomly. Cards which were never drawn after a shuffle are placed at the bottom of the deck
+    in the order they were discarded, since their real order isn't recorded.
+    """
+
+    def __init__(self, state: EngineState, draws_after_shuffle: dict[int, list[int]]):
+        super().__init__(state)
+        self.draws_after_shuffle = draws_after_shuffle
+
+
+    def _commit_record_shuffled_cards(self, r: RecordShuffledCards) -> None:
+        if len(self.state.deck) != 0:
+            raise RuntimeError("Shuffled cards before deck was empty.")
+
+        drawn = self.draws_after_shuffle[len(self.state.recording) - 1]
+        drawn_set = set(drawn)
+        undrawn = [card for card in self.state.discarded_deck if card.card_id not in drawn_set]
+        self.state.deck = undrawn + [self.state.cards[card] for card in reversed(drawn)]
+        self.state.discarded_deck = []
+
+
+    def _commit_record_drew_card(self, r: RecordDrewCard) -> None:
+        card = self.state.deck.pop()
+        if card.card_id != r.card.card_id:
+            raise RuntimeError(f"Replay drew card {card.card_id} but the game log drew card {r.card.card_id}.")
+
+        self.state.players[r.player].cards.append(card)
+
+
+class GameReplay():
+    """Reconstructs the full EngineState at any record of a game from its game log (game.json).
+
+    States are reached by committing the logged records with a ReplayStateMutator, starting from the nearest cached
+    checkpoint at or before the requested record. A checkpoint is cached every 'checkpoint_interval' records the first
+    time the replay passes it, so repeated queries on the same game only replay up to one interval of records.
+    """
+
+    def __init__(self, path: str, checkpoint_interval: int = 500):
+        with open(path, "r") as f:
+            self.records: list[RecordType] = recording_adapter.validate_json(f.read())
+
+        if len(self.records) == 0 or not isinstance(self.records[0], RecordStartGame):
+            raise ValueError("The game log doesn't start with a RecordStartGame.")
+
+        self.checkpoint_interval = checkpoint_interval
+        self.draws_after_shuffle = self._get_draws_after_shuffle()
+
+        record_start_game = cast(RecordStartGame, self.records[0])
+        players = sorted(record_start_game.players, key=lambda x: x.player_id)
+        initial_state = EngineState(catalog=[{"team_id": x.team_id} for x in players])
+        self._checkpoints: list[EngineState] = [initial_state]
+        self._checkpoint_ids: list[int] = [-1]
+
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+    def _get_draws_after_shuffle(self) -> dict[int, list[int]]:
+        result: dict[int, list[int]] = {}
+        drawn: list[int] = []
+        for i, record in enumerate(self.records):
+            match record:
+                case RecordShuffledCards():
+                    drawn = []
+                    result[i] = drawn
+                case RecordDrewCard() as r:
+                    drawn.append(r.card.card_id)
+
+        return result
+
+
+    def get_state(self, record_id: int) -> EngineState:
+        """Returns the state after the record with id 'record_id' was committed, the state is a copy that the caller may modify.
+        Committing a MoveRedeemCards also commits the RecordRedeemedCards that follows it.
+        """
+
+        if not 0 <= record_id < len(self.records):
+            raise IndexError(f"No record exists with id {record_id}, the game log has {len(self.records)} records.")
+
+        k = bisect_right(self._checkpoint_ids, record_id) - 1
+        state = copy_state(self._checkpoints[k])
+        mutator = ReplayStateMutator(state, self.draws_after_shuffle)
+
+        while len(state.recording) <= record_id:
+            i = len(state.recording)
+            record = self.records[i]
+
+            # Nothing refers back past the start of an attack, so earlier records don't need to be kept.
+            if isinstance(record, (MoveAttack, MoveAttackPass)):
+                state.recording.release(i)
+
+            mutator.commit(record)
+
+            # The mutator emits the RecordRedeemedCards for a MoveRedeemCards itself, so check it matches the game log.
+            if len(state.recording) > i + 1 and state.recording[-1] != self.records[len(state.recording) - 1]:
+                raise RuntimeError(f"Replay diverged from the game log at record {len(state.recording) - 1}.")
+
+            # Cache the first state committed in each interval past the latest checkpoint.
+            last_committed = len(state.recording) - 1
+            if last_committed > self._checkpoint_ids[-1] and last_committed // self.checkpoint_interval != self._checkpoint_ids[-1] // self.checkpoint_interval:
+                self._checkpoints.append(copy_state(state))
+                self._checkpoint_ids.append(last_committed)
+
+        return state
@@ -0,0 +1,44 @@
+import os
+from typing import Optional
+
+from risk_engine.config.ioconfig import CORE_DIRECTORY
+from risk_engine.connection.player_connection import PlayerConnection
+from risk_engine.exceptions import PlayerException
+from risk_engine.game_engine import GameEngine
+from risk_engine.output.game_result import GameCancelledResult, GameSuccessResult
+
+
+def run_session(games: int, print_recording_interactive: bool = False, seed: Optional[int] = None, trace: bool = False) -> None:
+    """Plays 'games' matches back to back over the same player connections, so the players only start up once.
+
+    With a single game the output is written to output/ as usual, otherwise each game's output is written to
+    output/game<k>/ and the results of every game to output/session.json. Game k is seeded with 'seed' + k. The
+    session stops early if a player is banned, since their connection can't be relied on for the next game.
+    """
+
+    results = []
+    connections: dict[int, PlayerConnection] = {}
+    for game in range(games):
+        output_directory = f"{CORE_DIRECTORY}/output" if games == 1 else f"{CORE_DIRECTORY}/output/game{game}"
+        os.makedirs(output_directory, exist_ok=True)
+
+        if game > 0:
+            try:
+                for connection in connections.values():
+                    connection.start_new_game(game)
+            except PlayerException as e:
+                print(f"[engine]: session stopped, couldn't start game {game} for player {e.player_id}: {e.error_message}", flush=True)
+                break
+
+        engine = GameEngine(print_recording_interactive, seed=None if seed is None else seed + game, trace=trace, output_directory=output_directory, connections=connections)
+        engine.start()
+
+        result = engine.inspector.get_result()
+        results.append(result)
+        connections = engine.connections
+        if not isinstance(result, (GameSuccessResult, GameCancelledResult)):
+            break
+
+    if games > 1:
+        with open(f"{CORE_DIRECTORY}/output/session.json", "w") as f:
+            f.write("[" + ",".join([result.model_dump_json() for result in results]) + "]")
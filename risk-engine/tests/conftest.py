@@ -0,0 +1,21 @@
+import gzip
+from pathlib import Path
+import shutil
+
+import pytest
+
+
+# The game log of a full game between five copies of example_submissions/complex.py, recorded from a match played
+# with seed 5 (the bots depend on timing, so the game can't be reproduced exactly).
+GAME_LOG = Path(__file__).parent / "data" / "game.json.gz"
+
+
+@pytest.fixture(scope="session")
+def game_log(tmp_path_factory) -> str:
+    """Returns the path to the decompressed game log.
+    """
+
+    path = tmp_path_factory.mktemp("game") / "game.json"
+    with gzip.open(GAME_LOG, "rb") as source, open(path, "wb") as target:
+        shutil.copyfileobj(source, target)
+    return str(path)
@@ -0,0 +1,110 @@
+from bisect import bisect_left
+import json
+from typing import Optional, cast
+
+import pytest
+
+from risk_engine.game.engine_state import EngineState
+from risk_engine.output.recording_inspector import FORWARDS_DIFFERENTIAL_FILE, KEYFRAMES_FILE, KEYFRAMES_INDEX_FILE, RecordingInspector
+from risk_engine.output.visualiser_seeker import VisualiserSeeker, decode_array_elements
+from risk_engine.replay.game_replay import GameReplay, ReplayStateMutator
+from risk_shared.records.moves.move_redeem_cards import MoveRedeemCards
+from risk_shared.records.record_start_game import RecordStartGame
+
+
+Board = dict[int, tuple[Optional[int], int]]
+
+
+def record_game(game_log: str, output_directory: str, keyframe_interval: int, records: Optional[int] = None) -> list[Board]:
+    """Replays the first 'records' records of the game log with a RecordingInspector writing the visualiser files to
+    'output_directory', and returns the board after each record.
+    """
+
+    replay = GameReplay(game_log)
+    records = records if records is not None else len(replay)
+    players = sorted(cast(RecordStartGame, replay.records[0]).players, key=lambda x: x.player_id)
+    state = EngineState(catalog=[{"team_id": x.team_id} for x in players])
+    mutator = ReplayStateMutator(state, replay.draws_after_shuffle)
+    mutator.inspector = RecordingInspector(state, output_directory=output_directory, keyframe_interval=keyframe_interval)
+
+    # Committing a MoveRedeemCards also commits the RecordRedeemedCards after it, both leave the same board.
+    boards: list[Board] = []
+    while len(state.recording) < records:
+        mutator.commit(replay.records[len(state.recording)])
+        board = dict([(x.territory_id, (x.occupier, x.troops)) for x in state.territories.values()])
+        boards.extend([board] * (len(state.recording) - len(boards)))
+
+    mutator.inspector.close()
+    return boards
+
+
+def get_elements(data: str) -> list[tuple[int, int]]:
+    """Returns the offset and record id of each differential in a visualiser differential file.
+    """
+
+    decoder = json.JSONDecoder()
+    elements = []
+    i = 1
+    while i < len(data):
+        if data[i] in ",]":
+            i += 1
+            continue
+
+        element, end = decoder.raw_decode(data, i)
+        elements.append((i, element[0]))
+        i = end
+    return elements
+
+
+def to_board(territories) -> Board:
+    return dict([(x["territory_id"], (x["occupier"], x["troops"])) for x in territories])
+
+
+@pytest.mark.parametrize("keyframe_interval, records", [(1, 1500), (2, 1500), (7, None), (100, None)])
+def test_keyframes_are_written_in_record_order(game_log, tmp_path, keyframe_interval, records):
+    boards = record_game(game_log, str(tmp_path), keyframe_interval, records)
+
+    with open(tmp_path / KEYFRAMES_FILE, "r") as f:
+        keyframes = json.load(f)
+    assert [x[0] for x in keyframes] == list(range(0, len(boards), keyframe_interval))
+    for i, territories in keyframes:
+        assert to_board(territories) == boards[i]
+
+    with open(tmp_path / KEYFRAMES_INDEX_FILE, "r") as f:
+        index = json.load(f)
+    assert index["interval"] == keyframe_interval
+    assert [x[0] for x in index["keyframes"]] == [x[0] for x in keyframes]
+
+    # Each keyframe's offsets point at the keyframe, and just past the last change to the board at or before it.
+    with open(tmp_path / KEYFRAMES_FILE, "rb") as f:
+        keyframes_data = f.read().decode()
+    with open(tmp_path / FORWARDS_DIFFERENTIAL_FILE, "rb") as f:
+        differential = get_elements(f.read().decode())
+    assert [x[1] for x in differential] == sorted(x[1] for x in differential)
+    for i, keyframe_offset, differential_offset in index["keyframes"]:
+        assert next(decode_array_elements(keyframes_data[keyframe_offset:]))[0] == i
+        k = bisect_left([x[0] for x in differential], differential_offset)
+        assert k == 0 or differential[k - 1][1] <= i
+        assert k == len(differential) or differential[k][1] > i
+
+
+@pytest.mark.parametrize("keyframe_interval, records", [(1, 1500), (7, None), (100, None)])
+def test_seeker_finds_the_board_around_each_keyframe(game_log, tmp_path, keyframe_interval, records):
+    boards = record_game(game_log, str(tmp_path), keyframe_interval, records)
+    seeker = VisualiserSeeker(str(tmp_path))
+
+    keyframes = range(0, len(boards), keyframe_interval)
+    record_ids = set([x + y for x in keyframes for y in [-1, 0, 1]] + list(range(0, len(boards), 10)))
+    for i in sorted(x for x in record_ids if 0 <= x < len(boards)):
+        assert to_board(x.model_dump() for x in seeker.get_territories(i).values()) == boards[i]
+
+
+def test_seeker_at_a_nested_redeem(game_log, tmp_path):
+    replay = GameReplay(game_log)
+    redeem = next(i for i, x in enumerate(replay.records) if isinstance(x, MoveRedeemCards) and len(x.sets) > 0)
+
+    # With an interval of 1, the RecordRedeemedCards committed inside the MoveRedeemCards finishes first.
+    boards = record_game(game_log, str(tmp_path), 1, redeem + 3)
+    seeker = VisualiserSeeker(str(tmp_path))
+    for i in [redeem - 1, redeem, redeem + 1, redeem + 2]:
+        assert to_board(x.model_dump() for x in seeker.get_territories(i).values()) == boards[i]
@@ -0,0 +1,45 @@
+import sys
+import traceback
+from typing import Iterator, Optional, TypeVar
+
+from risk_helper.time_budget import Deadline
+from risk_shared.records.types.move_type import MoveType
+
+
+T = TypeVar("T", bound=MoveType)
+
+
+def run_anytime(fallback: T, improvements: Iterator[Optional[T]], deadline: Deadline) -> T:
+    """Returns the best move found before 'deadline', starting from 'fallback'.
+
+    'improvements' is usually a generator that does a small step of search each time it is advanced, and yields
+    a better move when it finds one, or None if it hasn't found one yet. Steps are run until the deadline passes
+    or the generator finishes, the last move yielded is returned. A step can't be interrupted, so keep them short.
+    If a step raises an exception the best move so far is still returned, and the exception is printed to stderr.
+
+        def search_attack(game, query):
+            for candidate in candidates:
+                if better(candidate):
+                    yield game.move_attack(query, ...)
+                else:
+                    yield None
+
+        return game.choose_anytime_move(game.move_attack_pass(query), search_attack(game, query))
+    """
+
+    best = fallback
+    try:
+        while not deadline.expired():
+            move = next(improvements)
+            if move is not None:
+                best = move
+    except StopIteration:
+        pass
+    except Exception:
+        traceback.print_exc(file=sys.stderr)
+    finally:
+        close = getattr(improvements, "close", None)
+        if close is not None:
+            close()
+
+    return best
@@ -0,0 +1,63 @@
+from collections import deque
+import sys
+import traceback
+from typing import Any, Iterator
+
+
+class BackgroundTasks():
+    """Work to run while waiting for the engine's next query, when the engine isn't timing you.
+
+    A task is a generator that does a small step of work each time it is advanced, for example
+
+        def precompute_distances(game):
+            for territory in game.state.map.get_vertices():
+                distances[territory] = bfs(game, territory)
+                yield
+
+        game.add_background_task(precompute_distances(game))
+
+    Tasks are stepped in turn while no query is waiting. A query that arrives during a step has to wait for the step
+    to finish, and that time counts against you, so keep steps short (a millisecond or so). A task is removed
+    when it finishes, or if it raises an exception, which is printed to stderr.
+    """
+
+    def __init__(self):
+        self._tasks: deque[Iterator[Any]] = deque()
+
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+
+    def add(self, task: Iterator[Any]) -> None:
+        self._tasks.append(task)
+
+
+    def clear(self) -> None:
+        """Removes all tasks, closing them so their cleanup (finally blocks) runs.
+        """
+
+        for task in self._tasks:
+            close = getattr(task, "close", None)
+            if close is not None:
+                close()
+        self._tasks.clear()
+
+
+    def step(self) -> bool:
+        """Runs a single step of the next task, returns whether there is any work left.
+        """
+
+        if len(self._tasks) == 0:
+            return False
+
+        task = self._tasks.popleft()
+        try:
+            next(task)
+            self._tasks.append(task)
+        except StopIteration:
+            pass
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+
+        return len(self._tasks) > 0
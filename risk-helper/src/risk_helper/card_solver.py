@@ -0,0 +1,101 @@
+from functools import cache
+from itertools import combinations_with_replacement
+from typing import Optional, Tuple
+
+from risk_helper.client_state import ClientState
+from risk_shared.queries.query_redeem_cards import QueryRedeemCards
+
+
+# A hand is reduced to how many cards it has of each kind, a kind being a symbol and, except for wildcards (which
+# have no territory), whether the card's territory is one we own and so earns the matching territory bonus.
+KINDS = [("Infantry", True), ("Infantry", False), ("Cavalry", True), ("Cavalry", False), ("Artillery", True), ("Artillery", False), ("Wildcard", False)]
+SET_KINDS = [x for x in combinations_with_replacement(range(len(KINDS)), 3) if len(set([KINDS[i][0] for i in x])) in [1, 3] or "Wildcard" in [KINDS[i][0] for i in x]]
+MATCHING_TERRITORY_BONUS = 2
+
+
+def get_set_bonus(sets_redeemed: int) -> int:
+    """Returns the troops earned by redeeming a set, when 'sets_redeemed' sets have already been redeemed in the game.
+    """
+
+    fixed_values = [4, 6, 8, 10, 12, 15]
+    if sets_redeemed < len(fixed_values):
+        return fixed_values[sets_redeemed]
+
+    return 15 + (sets_redeemed - len(fixed_values) + 1) * 5
+
+
+@cache
+def _best_sets(counts: Tuple[int, ...], set_count: int, start: int) -> Optional[Tuple[bool, int, Tuple[int, ...]]]:
+    """Returns (matching, -wildcards used, set kinds) for the best way to make exactly 'set_count' sets from a hand
+    with 'counts' of each kind, using only set kinds from 'start' on, or None if it isn't possible.
+    """
+
+    if set_count == 0:
+        return (False, 0, ())
+
+    best = None
+    for i in range(start, len(SET_KINDS)):
+        kinds = SET_KINDS[i]
+        remaining = list(counts)
+        for kind in kinds:
+            remaining[kind] -= 1
+        if min(remaining) < 0:
+            continue
+
+        rest = _best_sets(tuple(remaining), set_count - 1, i)
+        if rest is None:
+            continue
+
+        matching = rest[0] or any(KINDS[kind][1] for kind in kinds)
+        wildcards = rest[1] - sum(1 for kind in kinds if KINDS[kind][0] == "Wildcard")
+        candidate = (matching, wildcards, (i,) + rest[2])
+        if best is None or candidate[:2] > best[:2]:
+            best = candidate
+
+    return best
+
+
+@cache
+def _solve(counts: Tuple[int, ...], cause: str) -> Optional[Tuple[int, ...]]:
+    held = sum(counts)
+
+    # You must be left with fewer than 5 cards, and if redeeming after eliminating a player you must stop as soon as
+    # you have fewer than 5. Each set is worth more than the matching territory bonus, so redeem as many as allowed.
+    fewest_sets = max(0, (held - 2) // 3)
+    most_sets = held // 3 if cause == "turn_started" else (held - 2) // 3
+    for set_count in range(most_sets, fewest_sets - 1, -1):
+        best = _best_sets(counts, set_count, 0)
+        if best is not None:
+            return best[2]
+    return None
+
+
+def best_card_redemption(state: ClientState, query: QueryRedeemCards) -> Optional[Tuple[list[Tuple[int, int, int]], int]]:
+    """Returns the card sets to redeem in answer to 'query' that earn the most troops, and the troops they earn, or
+    None if no valid redemption exists.
+
+    The most sets allowed by the rules are redeemed, preferring to include a card for a territory we own (for the
+    matching territory bonus), then to keep wildcards. Solutions are cached by the kinds of cards in the hand, so
+    this is cheap to call every turn.
+    """
+
+    owned = state.get_owned_bitset(state.me.player_id)
+    cards_by_kind: list[list[int]] = [[] for _ in KINDS]
+    for card in state.me.cards:
+        matching = card.territory_id is not None and card.territory_id in owned
+        cards_by_kind[KINDS.index((card.symbol, matching))].append(card.card_id)
+
+    solution = _solve(tuple(len(x) for x in cards_by_kind), query.cause)
+    if solution is None:
+        return None
+
+    sets: list[Tuple[int, int, int]] = []
+    matching = False
+    for i in solution:
+        kinds = SET_KINDS[i]
+        sets.append((cards_by_kind[kinds[0]].pop(), cards_by_kind[kinds[1]].pop(), cards_by_kind[kinds[2]].pop()))
+        matching = matching or any(KINDS[kind][1] for kind in kinds)
+
+    troops = sum(get_set_bonus(state.card_sets_redeemed + i) for i in range(len(sets)))
+    troops += MATCHING_TERRITORY_BONUS if matching else 0
+    return (sets, troops)
@@ -1,17 +1,26 @@
 from collections import defaultdict
+import copy
+from functools import partial
 from typing import Optional, Tuple, Union
+from risk_helper import zobrist
 from risk_shared.maps import earth
+from risk_shared.maps.territory_bitset import TerritoryBitset
 from risk_shared.models.card_model import CardModel
 from risk_shared.models.player_model import PlayerModel, PublicPlayerModel
 from risk_shared.models.territory_model import TerritoryModel
 from risk_shared.records.types.record_type import RecordType
 
 
+# A module level function rather than a lambda, so the defaultdicts that use it (and so ClientState) can be pickled.
+def _zeros(count: int) -> list[int]:
+    return [0] * count
+
+
 class ClientState():
 
     def __init__(self):
-        self.map = earth.create_map()
-        self.cards = earth.create_cards()
+        self.map = earth.get_map()
+        self.cards = earth.get_cards()
         self.deck_card_count: int = 0
         self.discarded_deck: list[CardModel] = list(self.cards.values())
         self.players: dict[int, PublicPlayerModel] = {}
@@ -22,6 +31,130 @@ class ClientState():
         self.new_records: int = 0
         self.me: PlayerModel
 
+        # Which territories each player (or None, for unclaimed) owns and their total troops, kept up to date through
+        # 'set_occupier' and 'add_troops' as the StateMutator commits records.
+        self._owned_masks: dict[Optional[int], int] = defaultdict(int, {None: self.map.get_all_mask()})
+        self._owned_troops: dict[Optional[int], int] = defaultdict(int)
+
+        # Each player's frontier (the territories they own that are adjacent to one they don't), and for each player
+        # and territory, the sum of that player's troops on the territories adjacent to it. Both are updated only
+        # around the territories that change.
+        territory_count = len(self.territories)
+        self._frontier_masks: dict[Optional[int], int] = defaultdict(int)
+        self._adjacent_troops: dict[Optional[int], list[int]] = defaultdict(partial(_zeros, territory_count))
+
+        # A Zobrist hash of the position (occupiers, bucketed troops and card counts, and the player to move, see
+        # risk_helper.zobrist), updated along with the state.
+        self._hash: int = 0
+        self._player_to_move: Optional[int] = None
+        self._card_buckets: dict[int, int] = {}
+
+
+    def copy(self) -> "ClientState":
+        """Copies the parts of the state that change as a game is played forward (territories, players, cards held
+        and the indexes over them), so search and rollouts can change the copy without changing this state. The map,
+        cards and the recording list itself are shared, so this takes the same time however long the game has been,
+        don't commit records to a copy (use copy.deepcopy for that).
+        """
+
+        result = copy.copy(self)
+        result.discarded_deck = list(self.discarded_deck)
+        result.players = dict([(x, y.model_copy(deep=True)) for x, y in self.players.items()])
+        result.territories = dict([(x, y.model_copy()) for x, y in self.territories.items()])
+        result.turn_order = list(self.turn_order)
+        if hasattr(self, "me"):
+            result.me = self.me.model_copy(update={"cards": list(self.me.cards), "must_place_territory_bonus": list(self.me.must_place_territory_bonus)})
+
+        result._owned_masks = self._owned_masks.copy()
+        result._owned_troops = self._owned_troops.copy()
+        result._frontier_masks = self._frontier_masks.copy()
+        result._adjacent_troops = defaultdict(self._adjacent_troops.default_factory, [(x, list(y)) for x, y in self._adjacent_troops.items()])
+        result._card_buckets = self._card_buckets.copy()
+        return result
+
+
+    def set_occupier(self, territory: int, player: Optional[int]) -> None:
+        model = self.territories[territory]
+        previous = model.occupier
+        if previous is not None:
+            self._hash ^= zobrist.occupier_key(territory, previous)
+        if player is not None:
+            self._hash ^= zobrist.occupier_key(territory, player)
+
+        bit = 1 << territory
+        self._owned_masks[previous] &= ~bit
+        self._owned_troops[previous] -= model.troops
+        self._frontier_masks[previous] &= ~bit
+
+        model.occupier = player
+        self._owned_masks[player] |= bit
+        self._owned_troops[player] += model.troops
+
+        previous_adjacent_troops = self._adjacent_troops[previous]
+        adjacent_troops = self._adjacent_troops[player]
+        for neighbour in self.map.get_adjacent_to(territory):
+            previous_adjacent_troops[neighbour] -= model.troops
+            adjacent_troops[neighbour] += model.troops
+            self._update_frontier(neighbour)
+        self._update_frontier(territory)
+
+
+    def add_troops(self, territory: int, troops: int) -> None:
+        model = self.territories[territory]
+        previous_bucket = zobrist.get_troop_bucket(model.troops)
+        model.troops += troops
+        self._owned_troops[model.occupier] += troops
+
+        bucket = zobrist.get_troop_bucket(model.troops)
+        if bucket != previous_bucket:
+            self._hash ^= zobrist.troops_key(territory, previous_bucket) ^ zobrist.troops_key(territory, bucket)
+
+        adjacent_troops = self._adjacent_troops[model.occupier]
+        for neighbour in self.map.get_adjacent_to(territory):
+            adjacent_troops[neighbour] += troops
+
+
+    def _update_frontier(self, territory: int) -> None:
+        occupier = self.territories[territory].occupier
+        if self.map.get_adjacency_mask(territory) & ~self._owned_masks[occupier] != 0:
+            self._frontier_masks[occupier] |= 1 << territory
+        else:
+            self._frontier_masks[occupier] &= ~(1 << territory)
+
+
+    def set_player_to_move(self, player: Optional[int]) -> None:
+        if self._player_to_move is not None:
+            self._hash ^= zobrist.to_move_key(self._player_to_move)
+        if player is not None:
+            self._hash ^= zobrist.to_move_key(player)
+        self._player_to_move = player
+
+
+    def get_player_to_move(self) -> Optional[int]:
+        return self._player_to_move
+
+
+    def update_card_counts(self) -> None:
+        """Brings the hash up to date with the number of cards each player holds, the StateMutator calls this after
+        each record, call it yourself after changing the cards of a copy of the state.
+        """
+
+        for player_id, player in self.players.items():
+            count = len(self.me.cards) if player_id == self.me.player_id else player.card_count
+            bucket = zobrist.get_card_bucket(count)
+            previous_bucket = self._card_buckets.get(player_id, 0)
+            if bucket != previous_bucket:
+                self._hash ^= zobrist.cards_key(player_id, previous_bucket) ^ zobrist.cards_key(player_id, bucket)
+                self._card_buckets[player_id] = bucket
+
+
+    def get_hash(self) -> int:
+        """Returns a 64 bit hash of the position, positions reached by different orders of moves hash the same,
+        see TranspositionTable.
+        """
+
+        return self._hash
+
 
     def get_card_set(self, cards: list[CardModel]) -> Optional[Tuple[CardModel, CardModel, CardModel]]:
         cards_by_symbol: dict[str, list[CardModel]] = defaultdict(list)
@@ -50,16 +183,78 @@ class ClientState():
 
 
     def get_territories_owned_by(self, player: Union[int, None]) -> list[int]:
-        return list([y.territory_id for y in filter(lambda x: x.occupier == player, self.territories.values())])
+        return TerritoryBitset(self._owned_masks.get(player, 0)).to_list()
+
+
+    def get_territory_count_owned_by(self, player: Union[int, None]) -> int:
+        return self._owned_masks.get(player, 0).bit_count()
+
+
+    def get_troops_owned_by(self, player: Union[int, None]) -> int:
+        return self._owned_troops.get(player, 0)
     
     
     def get_all_border_territories(self, territories: list) -> list[int]:
-        return [territory for territory in territories if len(set(self.map.get_adjacent_to(territory)) - set(territories)) != 0]
+        outside = ~TerritoryBitset.of(territories).mask
+        return [territory for territory in territories if self.map.get_adjacency_mask(territory) & outside != 0]
 
 
     def get_all_adjacent_territories(self, territories: list[int]) -> list[int]:
-        result = []
+        return self.get_adjacent_bitset(TerritoryBitset.of(territories)).to_list()
+
+
+    def get_owned_bitset(self, player: Union[int, None]) -> TerritoryBitset:
+        return TerritoryBitset(self._owned_masks.get(player, 0))
+
+
+    def get_frontier_bitset(self, player: Union[int, None]) -> TerritoryBitset:
+        """Returns the territories owned by 'player' that are adjacent to a territory they don't own, the same as
+        get_border_bitset(get_owned_bitset(player)) but without any work.
+        """
+
+        return TerritoryBitset(self._frontier_masks.get(player, 0))
+
+
+    def get_adjacent_troops(self, territory: int, player: Union[int, None]) -> int:
+        """Returns the total troops 'player' has on the territories adjacent to 'territory'.
+        """
+
+        if player not in self._adjacent_troops:
+            return 0
+        return self._adjacent_troops[player][territory]
+
+
+    def get_threat(self, territory: int) -> int:
+        """Returns the total troops on the territories adjacent to 'territory' that are owned by other players
+        than its occupier.
+        """
+
+        occupier = self.territories[territory].occupier
+        return sum(troops[territory] for player, troops in self._adjacent_troops.items() if player is not None and player != occupier)
+
+
+    def get_threat_by_player(self, territory: int) -> dict[int, int]:
+        """Returns, for each other player than the occupier of 'territory' with troops adjacent to it, the total of those troops.
+        """
+
+        occupier = self.territories[territory].occupier
+        return dict([(player, troops[territory]) for player, troops in self._adjacent_troops.items() if player is not None and player != occupier and troops[territory] > 0])
+
+
+    def get_border_bitset(self, territories: TerritoryBitset) -> TerritoryBitset:
+        """Returns the territories in 'territories' that are adjacent to a territory not in 'territories'.
+        """
+
+        outside = ~territories.mask
+        border = 0
         for territory in territories:
-            result.extend(self.map.get_adjacent_to(territory))
+            if self.map.get_adjacency_mask(territory) & outside != 0:
+                border |= 1 << territory
+        return TerritoryBitset(border)
+
+
+    def get_adjacent_bitset(self, territories: TerritoryBitset) -> TerritoryBitset:
+        """Returns the territories not in 'territories' that are adjacent to a territory in 'territories'.
+        """
 
-        return list(set(result) - set(territories))
+        return territories.neighbours(self.map) - territories
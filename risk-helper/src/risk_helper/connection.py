@@ -1,6 +1,12 @@
+import codecs
 import math
+import os
+from select import select
+from time import perf_counter
+from typing import Callable, Optional, Union
 
 from pydantic import Field, RootModel, TypeAdapter
+from risk_shared.queries.query_new_game import QueryNewGame
 from risk_shared.queries.query_type import QueryType
 from risk_shared.records.types.move_type import MoveType
 
@@ -8,13 +14,22 @@ MAX_CHARACTERS_READ = 1000000
 READ_CHUNK_SIZE = 1024
 
 class DiscriminatedTypeAdapter(RootModel):
-    root: QueryType = Field(discriminator="query_type")
+    root: Union[QueryType, QueryNewGame] = Field(discriminator="query_type")
 
 class Connection():
 
-    def __init__(self):
-        self._to_engine_pipe = open(f"./io/to_engine.pipe", "w")
-        self._from_engine_pipe = open(f"./io/from_engine.pipe", "r")
+    def __init__(self, on_idle: Optional[Callable[[], bool]] = None, io_directory: str = "./io"):
+        self._to_engine_pipe = open(f"{io_directory}/to_engine.pipe", "w")
+
+        # Read unbuffered and buffer ourselves, so messages we have already read are in '_pending' where we can see
+        # them, rather than hidden in a file object's buffer where select() can't.
+        self._from_engine_pipe = open(f"{io_directory}/from_engine.pipe", "rb", buffering=0)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._pending: str = ""
+        self._last_read_at: float = 0
+        self._pending_received_at: float = 0
+        self.query_received_at: float = 0
+        self.on_idle = on_idle
 
     
     def _send(self, data: str) -> None:
@@ -23,33 +38,71 @@ class Connection():
         self._to_engine_pipe.flush()
 
     
+    def _wait_while_idle(self) -> Optional[float]:
+        """Calls 'on_idle' until a message is waiting or it has no more work to do. If a message arrived during a call,
+        returns when that call started, since the message may have been waiting for that long.
+        """
+
+        if self.on_idle is None:
+            return None
+
+        step_started = None
+        while len(self._pending) == 0 and len(select([self._from_engine_pipe], [], [], 0)[0]) == 0:
+            step_started = perf_counter()
+            if not self.on_idle():
+                return None
+
+        return step_started
+
+
+    def _read_chunk(self) -> None:
+        data = os.read(self._from_engine_pipe.fileno(), READ_CHUNK_SIZE)
+        if len(data) == 0:
+            raise RuntimeError("The engine closed the connection.")
+        self._last_read_at = perf_counter()
+        self._pending += self._decoder.decode(data)
+
+
     def _receive(self) -> str:
-        
+        arrived_by = self._wait_while_idle()
+
+        # The engine's clock is running from the first byte, which may have been read along with the previous message.
+        if len(self._pending) > 0:
+            self.query_received_at = self._pending_received_at
+        else:
+            self._read_chunk()
+            self.query_received_at = self._last_read_at if arrived_by is None else arrived_by
+
         # Read size of message.
-        buffer = bytearray()
-        while len(buffer) < math.floor(math.log10(MAX_CHARACTERS_READ)) + 1 and (len(buffer) == 0 or buffer[-1] != ord(",")):
-            buffer.extend(self._from_engine_pipe.read(1).encode())
+        max_size_length = math.floor(math.log10(MAX_CHARACTERS_READ)) + 1
+        while "," not in self._pending[:max_size_length] and len(self._pending) < max_size_length:
+            self._read_chunk()
 
-        if buffer[-1] == ord(","):
-            size = int(buffer[0:-1].decode())
+        separator = self._pending.find(",", 0, max_size_length)
+        if separator != -1:
+            size = int(self._pending[:separator])
         else:
-            print(buffer)
+            print(self._pending[:max_size_length])
             raise RuntimeError("Please send us a discord message with this error log.")
         
         if size > MAX_CHARACTERS_READ:
             raise RuntimeError("Please send us a discord message with this error log.")
         
-        # Read message.
-        buffer = bytearray()
-        while len(buffer) < size:
-            buffer.extend(bytearray(self._from_engine_pipe.read(min((size - len(buffer)), READ_CHUNK_SIZE)).encode()))
+        # Read message, anything after it is the start of the next message, which was read at the same time as the end
+        # of this one.
+        end = separator + 1 + size
+        while len(self._pending) < end:
+            self._read_chunk()
 
-        return buffer.decode()
+        message = self._pending[separator + 1:end]
+        self._pending = self._pending[end:]
+        self._pending_received_at = self._last_read_at
+        return message
     
 
-    def get_next_query(self) -> QueryType:
+    def get_next_query(self) -> Union[QueryType, QueryNewGame]:
         return DiscriminatedTypeAdapter.model_validate_json(self._receive()).root
 
 
     def send_move(self, move: MoveType):
-        self._send(move.model_dump_json())
\ No newline at end of file
+        self._send(move.model_dump_json())
@@ -0,0 +1,116 @@
+from functools import cache
+from typing import Iterable, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("risk_helper.features needs NumPy, install it with 'pip install numpy' or 'pip install -e risk-helper[features]'.") from e
+
+from risk_helper.client_state import ClientState
+from risk_shared.maps.map import Map
+
+
+# Board features for every territory at once, computed with a few matrix operations instead of a loop over the
+# territories. Positions are arrays with the territory as the last axis, troops[v] and occupiers[v] (-1 for
+# unclaimed), and any leading axes are carried through, so candidate positions can be stacked and evaluated together:
+#
+#     troops, occupiers = get_positions([game.state] + candidates)
+#     features = get_features(game.state.map, troops, occupiers, game.state.me.player_id)
+#     scores = (features.troop_ratio * features.border).sum(axis=-1) + features.continent_bonus
+#
+# Use ClientState.get_threat and friends for a single territory, they are cheaper than building the arrays.
+
+
+class MapArrays():
+    """The map as arrays, the adjacency matrix, the continent each territory is in as a one-hot matrix (territory by
+    continent), and the size and bonus of each continent. They never change, so get them with get_map_arrays.
+    """
+
+    def __init__(self, map: Map):
+        territory_count = len(map.get_vertices())
+        continents = sorted(map.get_continents().keys())
+
+        self.adjacency = np.zeros((territory_count, territory_count))
+        for territory in range(territory_count):
+            self.adjacency[territory, list(map.get_adjacent_to(territory))] = 1
+
+        self.continents = np.zeros((territory_count, len(continents)))
+        for i, continent in enumerate(continents):
+            self.continents[list(map.get_continents()[continent]), i] = 1
+
+        self.continent_sizes = self.continents.sum(axis=0)
+        self.continent_bonuses = np.array([map.get_continent_bonus(x) for x in continents], dtype=float)
+
+        for array in [self.adjacency, self.continents, self.continent_sizes, self.continent_bonuses]:
+            array.flags.writeable = False
+
+
+@cache
+def get_map_arrays(map: Map) -> MapArrays:
+    return MapArrays(map)
+
+
+def get_troops(state: ClientState) -> np.ndarray:
+    return np.array([state.territories[x].troops for x in range(len(state.territories))], dtype=np.int64)
+
+
+def get_occupiers(state: ClientState) -> np.ndarray:
+    return np.array([_get_occupier(state, x) for x in range(len(state.territories))], dtype=np.int64)
+
+
+def _get_occupier(state: ClientState, territory: int) -> int:
+    occupier = state.territories[territory].occupier
+    return occupier if occupier is not None else -1
+
+
+def get_positions(states: Iterable[ClientState]) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the troops and occupiers of each state stacked into (state, territory) arrays.
+    """
+
+    states = list(states)
+    return (np.stack([get_troops(x) for x in states]), np.stack([get_occupiers(x) for x in states]))
+
+
+def get_owner_one_hot(occupiers: np.ndarray, players: Sequence[int]) -> np.ndarray:
+    """Returns an array with a trailing axis over 'players', which is 1 where the territory is occupied by that player.
+    """
+
+    return (occupiers[..., np.newaxis] == np.asarray(players)).astype(float)
+
+
+class Features():
+    """Features of a position for 'player', each an array over the territories (or continents) with the same leading
+    axes as the position.
+
+    owned, enemy: whether each territory is occupied by the player, or by another player.
+    friendly_adjacent_troops, enemy_adjacent_troops: the player's and other players' troops on adjacent territories.
+    enemy_neighbours: the number of adjacent territories occupied by other players.
+    border: whether each territory is owned and adjacent to an enemy territory.
+    troop_ratio: the troops on each territory over the enemy troops adjacent to it (plus one).
+    continent_owned: the fraction of each continent the player owns.
+    continent_progress: for each territory, the fraction of its continent the player owns.
+    continent_bonus: the troops the player earns each turn from the continents they hold.
+    """
+
+    def __init__(self, map_arrays: MapArrays, troops: np.ndarray, occupiers: np.ndarray, player: int):
+        self.owned = occupiers == player
+        self.enemy = (occupiers != player) & (occupiers != -1)
+
+        # The adjacency matrix is symmetric, so multiplying on the right sums over the neighbours of each territory.
+        self.friendly_adjacent_troops = (troops * self.owned) @ map_arrays.adjacency
+        self.enemy_adjacent_troops = (troops * self.enemy) @ map_arrays.adjacency
+        self.enemy_neighbours = self.enemy @ map_arrays.adjacency
+        self.border = self.owned & (self.enemy_neighbours > 0)
+        self.troop_ratio = troops / (self.enemy_adjacent_troops + 1)
+
+        self.continent_owned = (self.owned @ map_arrays.continents) / map_arrays.continent_sizes
+        self.continent_progress = self.continent_owned @ map_arrays.continents.T
+        self.continent_bonus = (self.continent_owned == 1) @ map_arrays.continent_bonuses
+
+
+def get_features(map: Map, troops: np.ndarray, occupiers: np.ndarray, player: int) -> Features:
+    return Features(get_map_arrays(map), troops, occupiers, player)
+
+
+def get_state_features(state: ClientState, player: int) -> Features:
+    return get_features(state.map, get_troops(state), get_occupiers(state), player)
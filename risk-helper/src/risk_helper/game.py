@@ -1,12 +1,20 @@
-from typing import Tuple
+from signal import SIGTERM, signal
+import sys
+from typing import Any, Iterator, Optional, Tuple, TypeVar
+from risk_helper.anytime import run_anytime
+from risk_helper.background_tasks import BackgroundTasks
 from risk_helper.connection import Connection
 from risk_helper.client_state import ClientState
+from risk_helper.speculator import Speculator
 from risk_helper.state_mutator import StateMutator
+from risk_helper.time_budget import TimeBudget
+from risk_shared.profiling.profiler import Profiler, get_profile_mode
 from risk_shared.queries.query_attack import QueryAttack
 from risk_shared.queries.query_claim_territory import QueryClaimTerritory
 from risk_shared.queries.query_defend import QueryDefend
 from risk_shared.queries.query_distribute_troops import QueryDistributeTroops
 from risk_shared.queries.query_fortify import QueryFortify
+from risk_shared.queries.query_new_game import QueryNewGame
 from risk_shared.queries.query_place_initial_troop import QueryPlaceInitialTroop
 from risk_shared.queries.query_redeem_cards import QueryRedeemCards
 from risk_shared.queries.query_troops_after_attack import QueryTroopsAfterAttack
@@ -24,27 +32,115 @@ from risk_shared.records.moves.move_troops_after_attack import MoveTroopsAfterAt
 from risk_shared.records.types.move_type import MoveType
 
 
+T = TypeVar("T", bound=MoveType)
+
+
 class Game():
+    """Connects to the engine and tracks the state of the game.
+
+    To profile your bot, set 'profile' to "cprofile" or "sampling" and/or set 'trace_memory'. The profile is
+    written to the submission's directory (submission.prof, submission_samples.txt, submission_memory.txt) when
+    the process receives SIGTERM, and every 'profile_every' queries if set. Writing periodically means the profile
+    survives the process being killed. The periodic write is a background task, so it only starts while no query is
+    waiting, but a query that arrives during the write waits for it to finish, and that time counts against you.
+
+    'time_budget' tracks how much of the engine's time limits you have used, use 'time_budget.deadline' for the
+    time by which to send your move for the current query, and 'time_budget.remaining()' for the time left in the game.
 
-    def __init__(self):
+    Work added with 'add_background_task' is run while waiting for the next query, off the engine's clock. Answers
+    to likely next queries can be prepared the same way by adding to 'speculator', use 'speculator.answer(query)'
+    to get a prepared move for a query.
+
+    If the engine plays a multi-game session, the state, time budget and prepared answers are replaced and background
+    tasks are dropped when each new game starts, so keep references to 'game.state' rather than the ClientState
+    itself, and add background tasks again for the new game. 'games_started' counts the games played so far, check
+    it to reset any state your bot keeps between queries.
+    """
+
+    def __init__(self, profile: Optional[str] = None, profile_every: Optional[int] = None, trace_memory: bool = False):
         self.state = ClientState()
         self.mutator = StateMutator(self.state)
-        self.connection = Connection()
+        self.profiler = Profiler(get_profile_mode(profile), trace_memory)
+        self.profile_every = profile_every
+        self._queries_received = 0
+        self.games_started = 1
+        self.time_budget = TimeBudget()
+        self.background_tasks = BackgroundTasks()
+        self.speculator = Speculator()
+
+        if self.profiler.enabled:
+            signal(SIGTERM, self._on_sigterm)
+            self.profiler.start()
+
+        self.connection = Connection(on_idle=self.background_tasks.step)
+
+
+    def _on_sigterm(self, *_) -> None:
+        self.write_profile()
+        sys.exit(0)
+
+
+    def write_profile(self) -> None:
+        self.profiler.dump(".", "submission")
+
+
+    def _write_profile_task(self) -> Iterator[None]:
+        self.write_profile()
+        yield
 
 
     def get_next_query(self) -> QueryType:
         query = self.connection.get_next_query()
+        while isinstance(query, QueryNewGame):
+            self._start_new_game()
+            query = self.connection.get_next_query()
+
+        self.time_budget.start_query(self.connection.query_received_at)
+        self._queries_received += 1
 
         new_records_mark = len(self.state.recording)
         for i, record in query.update.items():
             self.mutator.commit(i, record)
         self.state.new_records = new_records_mark
+        # We are asked for a move, so it is ours to make whatever the last move in the update was.
+        self.state.set_player_to_move(self.state.me.player_id)
+        self.speculator.invalidate(query.update)
 
         return query
     
 
+    def _start_new_game(self) -> None:
+        self.state = ClientState()
+        self.mutator = StateMutator(self.state)
+        self.time_budget = TimeBudget()
+        self.background_tasks.clear()
+        self.speculator.clear()
+        self.games_started += 1
+
+
     def send_move(self, move: MoveType) -> None:
         self.connection.send_move(move)
+        self.time_budget.end_query()
+
+        if len(self.speculator.speculations) > 0:
+            self.background_tasks.add(self.speculator.restart(move))
+        if self.profile_every is not None and self._queries_received % self.profile_every == 0:
+            self.background_tasks.add(self._write_profile_task())
+
+
+    def add_background_task(self, task: Iterator[Any]) -> None:
+        """Adds a generator to step while waiting for queries (see BackgroundTasks).
+        """
+
+        self.background_tasks.add(task)
+
+
+    def choose_anytime_move(self, fallback: T, improvements: Iterator[Optional[T]], seconds: Optional[float] = None) -> T:
+        """Runs 'improvements' until the current query's deadline (see TimeBudget.get_deadline) and returns the best
+        move found, or 'fallback' if none was found in time (see risk_helper.anytime.run_anytime).
+        """
+
+        return run_anytime(fallback, improvements, self.time_budget.get_deadline(seconds))
 
 
     def move_attack(self, query: QueryAttack, attacking_territory: int, defending_territory: int, attacking_troops: int) -> MoveAttack:
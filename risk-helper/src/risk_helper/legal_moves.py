@@ -0,0 +1,135 @@
+from itertools import combinations
+from typing import Iterator, Sequence, Tuple, cast
+
+from risk_helper.client_state import ClientState
+from risk_shared.maps.territory_bitset import TerritoryBitset
+from risk_shared.models.card_model import CardModel
+from risk_shared.queries.query_defend import QueryDefend
+from risk_shared.queries.query_redeem_cards import QueryRedeemCards
+from risk_shared.queries.query_troops_after_attack import QueryTroopsAfterAttack
+from risk_shared.records.moves.move_attack import MoveAttack
+from risk_shared.records.record_attack import RecordAttack
+
+
+# Enumerates the moves the engine will accept for each query, following the engine's MoveValidator. The options are
+# yielded as plain ids and troop counts rather than moves, so they are cheap to enumerate, make the move for the
+# option you pick with the matching Game.move_* method.
+
+
+def legal_claims(state: ClientState) -> Iterator[int]:
+    """Yields the territories that can be claimed.
+    """
+
+    return iter(state.get_owned_bitset(None))
+
+
+def legal_initial_placements(state: ClientState) -> Iterator[int]:
+    """Yields the territories an initial troop can be placed on.
+    """
+
+    return iter(state.get_owned_bitset(state.me.player_id))
+
+
+def legal_attacks(state: ClientState) -> Iterator[Tuple[int, int, int]]:
+    """Yields (attacking_territory, defending_territory, max_attacking_troops) for each attack that can be made,
+    any number of attacking troops from 1 to 'max_attacking_troops' can be committed.
+    """
+
+    player = state.me.player_id
+    not_owned = ~state.get_owned_bitset(player).mask
+    for attacking_territory in state.get_frontier_bitset(player):
+        troops = state.territories[attacking_territory].troops
+        if troops < 2:
+            continue
+
+        max_attacking_troops = min(3, troops - 1)
+        for defending_territory in TerritoryBitset(state.map.get_adjacency_mask(attacking_territory) & not_owned):
+            yield (attacking_territory, defending_territory, max_attacking_troops)
+
+
+def legal_fortifies(state: ClientState) -> Iterator[Tuple[int, int, int]]:
+    """Yields (source_territory, target_territory, max_troop_count) for each fortify that can be made, any number of
+    troops from 1 to 'max_troop_count' can be moved. Moving no troops is also allowed, but is the same as passing,
+    so sources with a single troop aren't included.
+    """
+
+    owned = state.get_owned_bitset(state.me.player_id)
+    for source_territory in owned:
+        troops = state.territories[source_territory].troops
+        if troops < 2:
+            continue
+
+        for target_territory in TerritoryBitset(state.map.get_adjacency_mask(source_territory) & owned.mask):
+            yield (source_territory, target_territory, troops - 1)
+
+
+def legal_distributions(state: ClientState) -> Iterator[dict[int, int]]:
+    """Yields, for each territory you own, a distribution of your remaining troops that puts as many as it can on
+    that territory. If you redeemed a set matching territories you own (see must_place_territory_bonus), at least
+    2 troops must go on one of them. The engine checks the matching territories in order, and fails on one that
+    isn't in the distribution before it finds the one with 2, so those 2 always go on the first.
+    """
+
+    troops = state.me.troops_remaining
+    must_place = state.me.must_place_territory_bonus
+    for territory in state.get_owned_bitset(state.me.player_id):
+        if len(must_place) == 0 or territory == must_place[0]:
+            yield {territory: troops}
+        elif troops > 2:
+            yield {must_place[0]: 2, territory: troops - 2}
+
+
+def legal_defending_troops(state: ClientState, query: QueryDefend) -> range:
+    move_attack = cast(MoveAttack, state.recording[query.move_attack_id])
+    return range(1, min(2, state.territories[move_attack.defending_territory].troops) + 1)
+
+
+def legal_troops_after_attack(state: ClientState, query: QueryTroopsAfterAttack) -> range:
+    record_attack = cast(RecordAttack, state.recording[query.record_attack_id])
+    move_attack = cast(MoveAttack, state.recording[record_attack.move_attack_id])
+
+    minimum_troops_moved = move_attack.attacking_troops - record_attack.attacking_troops_lost
+    return range(minimum_troops_moved, state.territories[move_attack.attacking_territory].troops)
+
+
+def is_card_set(cards: Sequence[CardModel]) -> bool:
+    """Returns whether three cards form a set, three of the same symbol, one of each symbol, or any with a wildcard.
+    """
+
+    symbols = set([card.symbol for card in cards])
+    return "Wildcard" in symbols or len(symbols) == 1 or len(symbols) == 3
+
+
+def legal_card_sets(cards: Sequence[CardModel]) -> Iterator[Tuple[int, int, int]]:
+    """Yields the card ids of every set that can be made from 'cards'.
+    """
+
+    for card_set in combinations(cards, 3):
+        if is_card_set(card_set):
+            yield (card_set[0].card_id, card_set[1].card_id, card_set[2].card_id)
+
+
+def legal_card_redemptions(state: ClientState, query: QueryRedeemCards) -> Iterator[list[Tuple[int, int, int]]]:
+    """Yields each combination of card sets that can be redeemed in answer to 'query', including redeeming none if
+    that's allowed. You must be left with fewer than 5 cards, and if you are redeeming because you eliminated a player
+    you must stop once you have fewer than 5, so you can't be left with fewer than 2.
+    """
+
+    held = len(state.me.cards)
+    card_sets = list(legal_card_sets(state.me.cards))
+    masks = [(1 << x) | (1 << y) | (1 << z) for x, y, z in card_sets]
+
+    def extend(chosen: list[int], used: int, start: int) -> Iterator[list[Tuple[int, int, int]]]:
+        remaining = held - 3 * len(chosen)
+        if remaining < 5:
+            if query.cause == "player_eliminated":
+                if remaining >= 2:
+                    yield [card_sets[i] for i in chosen]
+                return
+            yield [card_sets[i] for i in chosen]
+
+        for i in range(start, len(card_sets)):
+            if masks[i] & used == 0:
+                yield from extend(chosen + [i], used | masks[i], i + 1)
+
+    return extend([], 0, 0)
@@ -0,0 +1,257 @@
+from array import array
+from collections import defaultdict
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import os
+from random import Random
+import struct
+import sys
+import threading
+from time import perf_counter, sleep
+import traceback
+from typing import Any, Callable, Hashable, Iterator, Optional
+
+from risk_helper.client_state import ClientState
+from risk_helper.state_snapshot import SNAPSHOT_TYPECODE, read_snapshot, write_snapshot
+from risk_helper.time_budget import Deadline
+from risk_shared.limits import TIMEOUT_SECONDS
+from risk_shared.models.player_model import PlayerModel
+
+
+Rollout = Callable[[ClientState, Random], dict[Hashable, float]]
+
+# The shared memory holds a header of the snapshot's generation and length (in ints), then the snapshot. The generation
+# is set to -1 while a new snapshot is written, so a worker can tell if the snapshot changed while it was reading.
+_HEADER = struct.Struct("<qq")
+_WRITING = -1
+
+
+class RolloutResult():
+    """The statistics returned by each rollout, added up key by key, and the number of rollouts that finished.
+    """
+
+    def __init__(self):
+        self.rollouts = 0
+        self.stats: dict[Hashable, float] = defaultdict(float)
+
+
+    def merge(self, rollouts: int, stats: dict[Hashable, float]) -> None:
+        self.rollouts += rollouts
+        for key, value in stats.items():
+            self.stats[key] += value
+
+
+class RolloutPool():
+    """Runs rollouts (playing the game forward from the current position, usually at random) in parallel on worker
+    processes, so a bot can use the other cores of the machine it runs on.
+
+        def rollout(state: ClientState, random: Random) -> dict[Hashable, float]:
+            attack = random.choice(list(legal_attacks(state)))
+            ... play the attack and the rest of the game forward on 'state' ...
+            return {attack: 1 if won else 0, ("played", attack): 1}
+
+        pool = RolloutPool(rollout)
+
+        case QueryClaimTerritory() as q:
+            if not pool.started:
+                game.add_background_task(pool.warm_up())
+
+        case QueryAttack() as q:
+            result = pool.run(game.state, 256, game.time_budget.get_deadline())
+
+    'rollout' is called with a fresh copy of the position each time, it must be a module level function so it can be
+    sent to the workers. Each run writes a compact snapshot of the state (see risk_helper.state_snapshot) into shared
+    memory, which each worker reads once, then each rollout plays on a copy of it (see ClientState.copy). Rollouts
+    are sent to the workers in batches of 'batch_size', and a worker adds up the statistics of its batch, so only one
+    dict per batch is sent back. Workers stop starting rollouts once the deadline passes, and batches that haven't
+    finished by then are left out of the result.
+
+    Starting the workers takes a while, so start them off the engine's clock with 'warm_up' early in the game. With
+    the "fork" start method (the default where available), workers inherit the modules the bot has already imported.
+    Call 'close' to stop the workers, they also exit if the bot is killed.
+    """
+
+    def __init__(self, rollout: Rollout, workers: Optional[int] = None, batch_size: int = 8, snapshot_size: int = 1 << 16,
+                 start_method: Optional[str] = None, seed: Optional[int] = None):
+        if batch_size <= 0:
+            raise ValueError("The batch size of a rollout pool must be positive.")
+
+        self.rollout = rollout
+        self.workers = workers if workers is not None else _get_available_cores()
+        self.batch_size = batch_size
+        self.snapshot_size = snapshot_size
+        self._context = multiprocessing.get_context(start_method if start_method is not None else _get_default_start_method())
+        self._random = Random(seed)
+        self._pool: Optional[Any] = None
+        self._memory: Optional[SharedMemory] = None
+        self._workers_ready: Optional[Any] = None
+        self._generation = 0
+
+
+    @property
+    def started(self) -> bool:
+        return self._pool is not None
+
+
+    def start(self) -> None:
+        """Starts the workers, without waiting for them to be ready.
+        """
+
+        if self._pool is not None:
+            return
+
+        self._memory = SharedMemory(create=True, size=_HEADER.size + self.snapshot_size)
+        _HEADER.pack_into(self._memory.buf, 0, _WRITING, 0)
+        self._workers_ready = self._context.Value("i", 0)
+        self._pool = self._context.Pool(self.workers, initializer=_init_worker,
+                                        initargs=(self._memory.name, self.rollout, os.getpid(), self._workers_ready))
+
+
+    def warm_up(self) -> Iterator[None]:
+        """Returns a background task (see Game.add_background_task) that starts the workers and waits until each has
+        started up, so the first 'run' only pays for copying the snapshot.
+        """
+
+        self.start()
+        while self._workers_ready is not None and self._workers_ready.value < self.workers:
+            yield
+
+
+    def run(self, state: ClientState, rollouts: int, deadline: Optional[Deadline] = None) -> RolloutResult:
+        """Runs 'rollouts' rollouts from 'state', or as many as finish before 'deadline', and returns their statistics.
+        Without a deadline, stops at the engine's time limit for a query (TIMEOUT_SECONDS), so that a batch lost
+        because its worker died can't leave the bot waiting past the point it would be banned anyway.
+        """
+
+        if deadline is None:
+            deadline = Deadline(perf_counter() + TIMEOUT_SECONDS)
+
+        self.start()
+        generation = self._write_snapshot(state)
+        expires_at = deadline.expires_at
+
+        pending = []
+        for start in range(0, rollouts, self.batch_size):
+            arguments = (generation, min(self.batch_size, rollouts - start), self._random.getrandbits(64), expires_at)
+            pending.append(self._pool.apply_async(_run_batch, arguments))
+
+        # Once the deadline has passed this only collects the batches that have already finished.
+        result = RolloutResult()
+        for batch in pending:
+            try:
+                result.merge(*batch.get(deadline.remaining()))
+            except multiprocessing.TimeoutError:
+                continue
+        return result
+
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+
+    def _write_snapshot(self, state: ClientState) -> int:
+        assert self._memory is not None
+        data = write_snapshot(state).tobytes()
+        if len(data) > self.snapshot_size:
+            raise ValueError(f"The snapshot of the state is {len(data)} bytes, larger than the pool's snapshot size of {self.snapshot_size}.")
+
+        self._generation += 1
+        _HEADER.pack_into(self._memory.buf, 0, _WRITING, 0)
+        self._memory.buf[_HEADER.size:_HEADER.size + len(data)] = data
+        _HEADER.pack_into(self._memory.buf, 0, self._generation, len(data) // array(SNAPSHOT_TYPECODE).itemsize)
+        return self._generation
+
+
+def _get_available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _get_default_start_method() -> str:
+    return "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class _Worker():
+    """The state of a worker process, the shared memory it reads snapshots from, and the state read from the last
+    snapshot, which each rollout plays forward a copy of.
+    """
+
+    def __init__(self, memory: SharedMemory, rollout: Rollout):
+        self.memory = memory
+        self.rollout = rollout
+        self.generation = 0
+        self.state: Optional[ClientState] = None
+
+
+    def load_snapshot(self, generation: int) -> bool:
+        """Reads the snapshot for 'generation' if it isn't already loaded, returns False if it has been replaced.
+        """
+
+        if generation == self.generation:
+            return True
+
+        if _HEADER.unpack_from(self.memory.buf, 0)[0] != generation:
+            return False
+        _, length = _HEADER.unpack_from(self.memory.buf, 0)
+        snapshot = array(SNAPSHOT_TYPECODE)
+        snapshot.frombytes(self.memory.buf[_HEADER.size:_HEADER.size + length * snapshot.itemsize])
+        if _HEADER.unpack_from(self.memory.buf, 0)[0] != generation:
+            return False
+
+        self.generation = generation
+        self.state = read_snapshot(snapshot)
+        return True
+
+
+_worker: Optional[_Worker] = None
+
+
+def _init_worker(memory_name: str, rollout: Rollout, parent_pid: int, workers_ready: Any) -> None:
+    global _worker
+    _worker = _Worker(SharedMemory(name=memory_name), rollout)
+
+    # Exit if the bot is killed, rather than waiting forever for work.
+    threading.Thread(target=_exit_with_parent, args=(parent_pid,), daemon=True).start()
+
+    # Read and copy a snapshot once, so the first rollout doesn't pay for building the models and caches it needs.
+    state = ClientState()
+    state.me = PlayerModel(player_id=0, team_id=0, troops_remaining=0, alive=True, cards=[], must_place_territory_bonus=[])
+    state.players[0] = state.me.get_public()
+    state.turn_order.append(0)
+    read_snapshot(write_snapshot(state)).copy()
+
+    with workers_ready.get_lock():
+        workers_ready.value += 1
+
+
+def _exit_with_parent(parent_pid: int) -> None:
+    while os.getppid() == parent_pid:
+        sleep(1)
+    os._exit(0)
+
+
+def _run_batch(generation: int, rollouts: int, seed: int, expires_at: float) -> tuple[int, dict[Hashable, float]]:
+    assert _worker is not None
+    result = RolloutResult()
+    if not _worker.load_snapshot(generation):
+        return (0, {})
+    assert _worker.state is not None
+
+    random = Random(seed)
+    try:
+        for _ in range(rollouts):
+            if perf_counter() >= expires_at:
+                break
+            result.merge(1, _worker.rollout(_worker.state.copy(), random))
+    except Exception:
+        traceback.print_exc(file=sys.stderr)
+
+    return (result.rollouts, dict(result.stats))
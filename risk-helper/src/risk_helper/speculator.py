@@ -0,0 +1,124 @@
+from typing import Any, Callable, Iterator, Optional
+
+from risk_shared.queries.query_type import QueryType
+from risk_shared.records.types.move_type import MoveType
+from risk_shared.records.types.record_type import RecordType
+
+
+Answer = Callable[[Any], Optional[MoveType]]
+Prepare = Callable[[MoveType], Iterator[Optional[Answer]]]
+
+
+class Speculation():
+    """How to prepare an answer to a query type ahead of time.
+
+    'prepare' is a generator function, called with the move we last sent while waiting for queries. It should do
+    the expensive part of choosing a move from the current state in small steps, yielding None after each, then
+    yield a function that cheaply finishes the move once the query arrives (or returns None to fall back to the
+    normal handler). It can stop without yielding a function if the query isn't likely next. Each step is a
+    background step (see BackgroundTasks), so a query that arrives while preparing waits for one step at most.
+    The prepared answer is thrown away if the query's update holds any record that isn't an instance of one of
+    'tolerated_records', since the state it was prepared from has changed too much.
+    """
+
+    def __init__(self, query_type: str, prepare: Prepare, tolerated_records: tuple[type, ...] = ()):
+        self.query_type = query_type
+        self.prepare = prepare
+        self.tolerated_records = tolerated_records
+
+
+class Speculator():
+    """Prepares answers to the queries that are likely to arrive next, during idle time (see BackgroundTasks).
+
+    For example, QueryDistributeTroops always follows our MoveRedeemCards, with only our own MoveRedeemCards and
+    the RecordRedeemedCards it produced in between, so we can work out where the troops should go while the engine
+    handles the redeem.
+
+        def prepare_distribute(last_move):
+            if not isinstance(last_move, MoveRedeemCards):
+                return
+            scores = {}
+            for territory in game.state.get_territories_owned_by(game.state.me.player_id):
+                scores[territory] = score_border_territory(game, territory)
+                yield None
+            target = max(scores, key=scores.get)
+            yield lambda query: game.move_distribute_troops(query, {target: game.state.me.troops_remaining})
+
+        game.speculator.add(Speculation("distribute_troops", prepare_distribute, (MoveRedeemCards, RecordRedeemedCards)))
+
+    Preparation restarts from scratch after each move we send, and stops when a query arrives.
+    """
+
+    def __init__(self):
+        self.speculations: list[Speculation] = []
+        self.hits = 0
+        self.misses = 0
+        self._prepared: dict[str, tuple[Speculation, Answer]] = {}
+        self._generation = 0
+
+
+    def add(self, speculation: Speculation) -> None:
+        self.speculations.append(speculation)
+
+
+    def restart(self, last_move: MoveType) -> Iterator[None]:
+        """Discards any prepared answers and returns a background task that prepares new ones from the current state.
+        """
+
+        self._generation += 1
+        self._prepared = {}
+        return self._prepare(self._generation, last_move)
+
+
+    def _prepare(self, generation: int, last_move: MoveType) -> Iterator[None]:
+        # Stop before each step if a query has arrived or a newer move has been sent, the state has moved on.
+        for speculation in list(self.speculations):
+            if generation != self._generation:
+                return
+
+            steps = speculation.prepare(last_move)
+            try:
+                for answer in steps:
+                    if answer is not None:
+                        self._prepared[speculation.query_type] = (speculation, answer)
+                        break
+                    yield
+                    if generation != self._generation:
+                        return
+            finally:
+                steps.close()
+            yield
+
+
+    def clear(self) -> None:
+        """Discards all prepared answers and stops preparing more.
+        """
+
+        self._generation += 1
+        self._prepared = {}
+
+
+    def invalidate(self, update: dict[int, RecordType]) -> None:
+        """Discards prepared answers that the records in 'update' may have made wrong, and stops preparing more,
+        since the state has moved on.
+        """
+
+        self._generation += 1
+        for query_type, (speculation, _) in list(self._prepared.items()):
+            if not all(isinstance(record, speculation.tolerated_records) for record in update.values()):
+                del self._prepared[query_type]
+
+
+    def answer(self, query: QueryType) -> Optional[MoveType]:
+        """Returns the prepared answer to 'query', or None if there isn't a valid one.
+        """
+
+        prepared = self._prepared.pop(query.query_type, None)
+        self._prepared = {}
+
+        move = prepared[1](query) if prepared is not None else None
+        if move is not None:
+            self.hits += 1
+        elif any(x.query_type == query.query_type for x in self.speculations):
+            self.misses += 1
+        return move
@@ -1,5 +1,7 @@
 from typing import TypeGuard, cast
+from risk_helper.card_solver import get_set_bonus
 from risk_helper.client_state import ClientState
+from risk_shared.records.base_move import BaseMove
 from risk_shared.records.moves.move_attack import MoveAttack
 from risk_shared.records.moves.move_attack_pass import MoveAttackPass
 from risk_shared.records.moves.move_claim_territory import MoveClaimTerritory
@@ -34,6 +36,11 @@ class StateMutator():
             raise RuntimeError("Please send us a discord message with this error log.")
         self.state.recording.append(record)
 
+        # The player to move is part of the position's hash (see ClientState.get_hash), and each move is made by the
+        # player to move, except that an attack hands the move to the defender.
+        if isinstance(record, BaseMove):
+            self.state.set_player_to_move(record.move_by_player)
+
         match record:
             case MoveAttack() as r:
                 self._commit_move_attack(r)
@@ -83,6 +90,7 @@ class StateMutator():
                 raise NotImplementedError
             
         self._update_public_player_model_to_me()
+        self.state.update_card_counts()
 
     
     def _update_public_player_model_to_me(self) -> None:
@@ -93,7 +101,7 @@ class StateMutator():
             
 
     def _commit_move_attack(self, r: MoveAttack) -> None:
-        pass
+        self.state.set_player_to_move(self.state.territories[r.defending_territory].occupier)
 
 
     def _commit_move_attack_pass(self, r: MoveAttackPass) -> None:
@@ -103,9 +111,8 @@ class StateMutator():
     def _commit_move_claim_territory(self, r: MoveClaimTerritory) -> None:
         player = self.state.players[r.move_by_player]
         
-        claimed_territory = self.state.territories[r.territory]
-        claimed_territory.occupier = r.move_by_player
-        claimed_territory.troops = 1
+        self.state.set_occupier(r.territory, r.move_by_player)
+        self.state.add_troops(r.territory, 1 - self.state.territories[r.territory].troops)
         player.troops_remaining -= 1
 
 
@@ -124,12 +131,12 @@ class StateMutator():
 
         # Distribute the troops.
         for territory, troops in r.distributions.items():
-            self.state.territories[territory].troops += troops
+            self.state.add_troops(territory, troops)
 
 
     def _commit_move_fortify(self, r: MoveFortify) -> None:
-        self.state.territories[r.source_territory].troops -= r.troop_count
-        self.state.territories[r.target_territory].troops += r.troop_count
+        self.state.add_troops(r.source_territory, -r.troop_count)
+        self.state.add_troops(r.target_territory, r.troop_count)
 
 
     def _commit_move_fortify_pass(self, r: MoveFortifyPass) -> None:
@@ -137,22 +144,15 @@ class StateMutator():
 
 
     def _commit_move_place_initial_troop(self, r: MovePlaceInitialTroop) -> None:
-        self.state.territories[r.territory].troops += 1
+        self.state.add_troops(r.territory, 1)
         self.state.players[r.move_by_player].troops_remaining -= 1
 
 
     def _commit_move_redeem_cards(self, r: MoveRedeemCards) -> None:
-        def calculate_set_bonus(x: int):
-            fixed_values = [4, 6, 8, 10, 12, 15]
-            if x < len(fixed_values):
-                return fixed_values[x]
-            
-            return 15 + (x - len(fixed_values) + 1) * 5
-
         # Give the set bonus for each set redeemed.
         total_set_bonus = 0
         for _ in range(len(r.sets)):
-            total_set_bonus += calculate_set_bonus(self.state.card_sets_redeemed)
+            total_set_bonus += get_set_bonus(self.state.card_sets_redeemed)
             self.state.card_sets_redeemed += 1
 
         # Give the matching territory bonus if applicable.
@@ -163,7 +163,7 @@ class StateMutator():
         def remove_none(x) -> TypeGuard[int]:
             return x != None
         
-        matching_territories = set(filter(remove_none, [self.state.cards[card].territory_id for card in all_cards])) & set(map(lambda x: x.territory_id, filter(lambda x: x.occupier == r.move_by_player, self.state.territories.values())))
+        matching_territories = set(filter(remove_none, [self.state.cards[card].territory_id for card in all_cards])) & set(self.state.get_territories_owned_by(r.move_by_player))
         matching_territory_bonus = 2 if len(matching_territories) > 0 else 0
 
         # Modify the player.
@@ -185,8 +185,8 @@ class StateMutator():
         move_attack_id = record_attack.move_attack_id
         move_attack = cast(MoveAttack, self.state.recording[move_attack_id])
         
-        self.state.territories[move_attack.attacking_territory].troops -= r.troop_count
-        self.state.territories[move_attack.defending_territory].troops += r.troop_count
+        self.state.add_troops(move_attack.attacking_territory, -r.troop_count)
+        self.state.add_troops(move_attack.defending_territory, r.troop_count)
 
 
     def _commit_record_attack(self, r: RecordAttack) -> None:
@@ -195,11 +195,11 @@ class StateMutator():
         attacking_territory = move_attack.attacking_territory
         defending_territory = move_attack.defending_territory
 
-        self.state.territories[attacking_territory].troops -= r.attacking_troops_lost
-        self.state.territories[defending_territory].troops -= r.defending_troops_lost
+        self.state.add_troops(attacking_territory, -r.attacking_troops_lost)
+        self.state.add_troops(defending_territory, -r.defending_troops_lost)
 
         if r.territory_conquered:
-            self.state.territories[defending_territory].occupier = move_attack.move_by_player
+            self.state.set_occupier(defending_territory, move_attack.move_by_player)
 
 
     def _commit_record_banned(self, r: RecordBanned) -> None:
@@ -269,6 +269,7 @@ class StateMutator():
 
 
     def _commit_record_start_turn(self, r: RecordStartTurn) -> None:
+        self.state.set_player_to_move(r.player)
         self.state.players[r.player].troops_remaining += r.territory_bonus + r.continent_bonus
 
 
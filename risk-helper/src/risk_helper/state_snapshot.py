@@ -0,0 +1,77 @@
+from array import array
+from itertools import islice
+from typing import Iterable, Iterator
+
+from risk_helper.client_state import ClientState
+from risk_shared.models.player_model import PlayerModel, PublicPlayerModel
+
+
+# A snapshot is the part of a ClientState that decides how the game can go from here, flattened into an array of
+# ints, so it is small and cheap to copy between processes (see RolloutPool). The recording isn't included. In order:
+#
+#   me, my team, player to move (-1 for none), card sets redeemed, deck card count, territory count, player count,
+#   the occupier (-1 for none) and troops of each territory,
+#   for each player in turn order, their id, troops remaining, whether they are alive, card count, and the number
+#   of territories they must place a bonus on followed by those territories,
+#   the number of cards I hold followed by their ids, then the same for the discarded deck.
+SNAPSHOT_TYPECODE = "i"
+
+
+def write_snapshot(state: ClientState) -> array:
+    """Returns a snapshot of 'state', see read_snapshot.
+    """
+
+    player_to_move = state.get_player_to_move()
+    snapshot = array(SNAPSHOT_TYPECODE, [state.me.player_id, state.me.team_id, player_to_move if player_to_move is not None else -1,
+                                         state.card_sets_redeemed, state.deck_card_count, len(state.territories), len(state.turn_order)])
+
+    for territory in state.territories.values():
+        snapshot.append(territory.occupier if territory.occupier is not None else -1)
+        snapshot.append(territory.troops)
+
+    for player_id in state.turn_order:
+        player = state.players[player_id]
+        snapshot.extend([player_id, player.troops_remaining, int(player.alive), player.card_count, len(player.must_place_territory_bonus)])
+        snapshot.extend(player.must_place_territory_bonus)
+
+    snapshot.append(len(state.me.cards))
+    snapshot.extend([card.card_id for card in state.me.cards])
+    snapshot.append(len(state.discarded_deck))
+    snapshot.extend([card.card_id for card in state.discarded_deck])
+    return snapshot
+
+
+def read_snapshot(snapshot: Iterable[int]) -> ClientState:
+    """Returns a new ClientState holding the position in 'snapshot', with an empty recording. It is independent of
+    the state the snapshot was taken from, so it can be played forward freely.
+    """
+
+    values = iter(snapshot)
+    state = ClientState()
+    me, team, player_to_move, state.card_sets_redeemed, state.deck_card_count, territory_count, player_count = _take(values, 7)
+
+    for territory in range(territory_count):
+        occupier, troops = _take(values, 2)
+        if occupier != -1:
+            state.set_occupier(territory, occupier)
+        state.add_troops(territory, troops)
+
+    for _ in range(player_count):
+        player_id, troops_remaining, alive, card_count, bonus_count = _take(values, 5)
+        state.turn_order.append(player_id)
+        state.players[player_id] = PublicPlayerModel(player_id=player_id, troops_remaining=troops_remaining, alive=bool(alive),
+                                                     card_count=card_count, must_place_territory_bonus=_take(values, bonus_count))
+
+    public = state.players[me]
+    state.me = PlayerModel(player_id=me, team_id=team, troops_remaining=public.troops_remaining, alive=public.alive,
+                           cards=[state.cards[x] for x in _take(values, next(values))],
+                           must_place_territory_bonus=list(public.must_place_territory_bonus))
+    state.discarded_deck = [state.cards[x] for x in _take(values, next(values))]
+
+    state.set_player_to_move(player_to_move if player_to_move != -1 else None)
+    state.update_card_counts()
+    return state
+
+
+def _take(values: Iterator[int], count: int) -> list[int]:
+    return list(islice(values, count))
@@ -0,0 +1,106 @@
+from time import perf_counter
+from typing import Optional
+
+from risk_shared.limits import CUMULATIVE_TIMEOUT_SECONDS, TIMEOUT_SECONDS
+
+
+class Deadline():
+    """A point in time by which a move should be sent.
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+
+    def remaining(self) -> float:
+        return max(self.expires_at - perf_counter(), 0)
+
+
+    def expired(self) -> bool:
+        return perf_counter() >= self.expires_at
+
+
+class TimeBudget():
+    """Estimates how much of the engine's time limits you have used, so you can scale the effort you spend on
+    each query to the time you have left.
+
+    A query's time is measured from the first byte of the query arriving to the move being sent, 'overhead_per_query'
+    is added on top for the parts the engine also counts but we can't see (it starts its clock before writing the
+    query, and stops it after reading and validating the move), the engine's metrics put it at 0.3 to 0.7 ms.
+
+    'safety_margin' is kept in reserve on both limits. On the cumulative limit, the overhead of the 'expected_queries'
+    still to come is kept back for them, since the engine charges it however quickly they are answered, and
+    'margin_per_query' more is kept for every query of the game, since the overhead is only an estimate and its error
+    adds up over thousands of queries.
+    """
+
+    def __init__(self, timeout_seconds: float = TIMEOUT_SECONDS, cumulative_timeout_seconds: float = CUMULATIVE_TIMEOUT_SECONDS,
+                 safety_margin: float = 0.1, overhead_per_query: float = 0.0005, margin_per_query: float = 0.0002,
+                 expected_queries: int = 3000, max_fraction_of_remaining: float = 0.1):
+        self.timeout_seconds = timeout_seconds
+        self.cumulative_timeout_seconds = cumulative_timeout_seconds
+        self.safety_margin = safety_margin
+        self.overhead_per_query = overhead_per_query
+        self.margin_per_query = margin_per_query
+        self.expected_queries = expected_queries
+        self.max_fraction_of_remaining = max_fraction_of_remaining
+        self.used: float = 0
+        self.queries: int = 0
+        self._query_started: Optional[float] = None
+
+
+    def start_query(self, received_at: float) -> None:
+        self._query_started = received_at
+
+
+    def end_query(self) -> None:
+        if self._query_started is None:
+            return
+        self.used += perf_counter() - self._query_started + self.overhead_per_query
+        self.queries += 1
+        self._query_started = None
+
+
+    def query_elapsed(self) -> float:
+        """Returns the time spent on the current query so far.
+        """
+
+        if self._query_started is None:
+            return 0
+        return perf_counter() - self._query_started
+
+
+    def reserved(self) -> float:
+        """Returns the part of the cumulative limit kept in reserve, see TimeBudget.
+        """
+
+        future_queries = max(self.expected_queries - self.queries - 1, 0)
+        return self.safety_margin + self.margin_per_query * (self.queries + future_queries) + self.overhead_per_query * future_queries
+
+
+    def remaining(self) -> float:
+        """Returns the estimated cumulative time remaining for the rest of the game, less the reserve
+        and including the time spent on the current query so far.
+        """
+
+        return max(self.cumulative_timeout_seconds - self.reserved() - self.used - self.query_elapsed(), 0)
+
+
+    def get_deadline(self, seconds: Optional[float] = None) -> Deadline:
+        """Returns the deadline for the current query, 'seconds' after the query arrived if given, otherwise
+        allowing 'max_fraction_of_remaining' of the remaining cumulative budget. Either way the deadline is
+        clamped so that neither limit (less the reserve) is exceeded.
+        """
+
+        started = self._query_started if self._query_started is not None else perf_counter()
+        cumulative_remaining = max(self.cumulative_timeout_seconds - self.reserved() - self.used - self.overhead_per_query, 0)
+
+        if seconds is None:
+            seconds = cumulative_remaining * self.max_fraction_of_remaining
+        seconds = min(seconds, self.timeout_seconds - self.safety_margin, cumulative_remaining)
+        return Deadline(started + max(seconds, 0))
+
+
+    @property
+    def deadline(self) -> Deadline:
+        return self.get_deadline()
@@ -0,0 +1,58 @@
+from typing import Any, Optional, Tuple
+
+
+class TranspositionTable():
+    """A fixed size table of search results by position hash (see ClientState.get_hash), so lookahead code can reuse
+    an evaluation when it reaches the same position by a different order of moves.
+
+        entry = table.lookup(state.get_hash(), depth)
+        if entry is None:
+            entry = evaluate(state, depth)
+            table.store(state.get_hash(), depth, entry)
+
+    Each hash has one slot, an entry replaces the one in its slot if the slot holds the same position, an entry from
+    an earlier search (see 'new_search'), or one searched to no greater depth, so the most expensive results are kept.
+    """
+
+    def __init__(self, capacity: int = 1 << 16):
+        if capacity <= 0:
+            raise ValueError("The capacity of a transposition table must be positive.")
+
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries: list[Optional[Tuple[int, int, int, Any]]] = [None] * capacity
+        self._generation = 0
+
+
+    def new_search(self) -> None:
+        """Marks the entries stored so far as old, so they are replaced before any stored by the new search.
+        """
+
+        self._generation += 1
+
+
+    def lookup(self, key: int, min_depth: int = 0) -> Optional[Any]:
+        """Returns the value stored for 'key' if it was searched to at least 'min_depth', otherwise None.
+        """
+
+        entry = self._entries[key % self.capacity]
+        if entry is not None and entry[0] == key and entry[1] >= min_depth:
+            self.hits += 1
+            return entry[3]
+
+        self.misses += 1
+        return None
+
+
+    def store(self, key: int, depth: int, value: Any) -> None:
+        index = key % self.capacity
+        entry = self._entries[index]
+        if entry is None or entry[0] == key or entry[2] != self._generation or entry[1] <= depth:
+            self._entries[index] = (key, depth, self._generation, value)
+
+
+    def clear(self) -> None:
+        self._entries = [None] * self.capacity
+        self.hits = 0
+        self.misses = 0
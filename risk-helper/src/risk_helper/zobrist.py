@@ -0,0 +1,45 @@
+import random
+
+
+# Keys are derived from their names rather than drawn at random, so every process (and every game) hashes the same
+# position the same way, and tables can be shared or saved.
+_keys: dict[tuple, int] = {}
+
+
+def get_key(*parts: object) -> int:
+    key = _keys.get(parts)
+    if key is None:
+        key = random.Random(":".join(["zobrist"] + [str(x) for x in parts])).getrandbits(64)
+        _keys[parts] = key
+    return key
+
+
+def occupier_key(territory: int, player: int) -> int:
+    return get_key("occupier", territory, player)
+
+
+# No troops and no cards have no key, so a new ClientState hashes to 0.
+def troops_key(territory: int, bucket: int) -> int:
+    return get_key("troops", territory, bucket) if bucket != 0 else 0
+
+
+def cards_key(player: int, bucket: int) -> int:
+    return get_key("cards", player, bucket) if bucket != 0 else 0
+
+
+def to_move_key(player: int) -> int:
+    return get_key("to_move", player)
+
+
+def get_troop_bucket(troops: int) -> int:
+    """Troop counts are exact up to 7, then bucketed by powers of two, since the exact size of a large army rarely
+    changes the evaluation of a position.
+    """
+
+    if troops < 8:
+        return troops
+    return 4 + troops.bit_length()
+
+
+def get_card_bucket(cards: int) -> int:
+    return min(cards, 10)
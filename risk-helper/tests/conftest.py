@@ -0,0 +1,123 @@
+import gzip
+import os
+from pathlib import Path
+import shutil
+import threading
+from typing import Iterator, cast
+
+import pytest
+
+from risk_engine.censoring.censor_record import CensorRecord
+from risk_engine.game.engine_state import EngineState
+from risk_engine.replay.game_replay import GameReplay, ReplayStateMutator
+from risk_helper.client_state import ClientState
+from risk_helper.connection import Connection
+from risk_helper.state_mutator import StateMutator
+from risk_shared.queries.query_attack import QueryAttack
+from risk_shared.queries.query_claim_territory import QueryClaimTerritory
+from risk_shared.queries.query_defend import QueryDefend
+from risk_shared.queries.query_distribute_troops import QueryDistributeTroops
+from risk_shared.queries.query_fortify import QueryFortify
+from risk_shared.queries.query_place_initial_troop import QueryPlaceInitialTroop
+from risk_shared.queries.query_redeem_cards import QueryRedeemCards
+from risk_shared.queries.query_troops_after_attack import QueryTroopsAfterAttack
+from risk_shared.queries.query_type import QueryType
+from risk_shared.records.base_move import BaseMove
+from risk_shared.records.moves.move_attack import MoveAttack
+from risk_shared.records.moves.move_attack_pass import MoveAttackPass
+from risk_shared.records.moves.move_claim_territory import MoveClaimTerritory
+from risk_shared.records.moves.move_defend import MoveDefend
+from risk_shared.records.moves.move_distribute_troops import MoveDistributeTroops
+from risk_shared.records.moves.move_fortify import MoveFortify
+from risk_shared.records.moves.move_fortify_pass import MoveFortifyPass
+from risk_shared.records.moves.move_place_initial_troop import MovePlaceInitialTroop
+from risk_shared.records.moves.move_redeem_cards import MoveRedeemCards
+from risk_shared.records.moves.move_troops_after_attack import MoveTroopsAfterAttack
+from risk_shared.records.record_start_game import RecordStartGame
+
+
+# The game log the engine's tests replay, see risk-engine/tests/conftest.py.
+GAME_LOG = Path(__file__).parents[2] / "risk-engine" / "tests" / "data" / "game.json.gz"
+
+
+@pytest.fixture
+def open_connection(tmp_path):
+    """Returns a function that opens a Connection over FIFOs in 'tmp_path', and returns it with the engine's end of
+    the pipe the Connection reads from.
+    """
+
+    def open_connection(on_idle):
+        os.mkfifo(tmp_path / "to_engine.pipe")
+        os.mkfifo(tmp_path / "from_engine.pipe")
+
+        # Opening a FIFO blocks until the other end is opened, so open the engine's ends on another thread.
+        engine_pipes = []
+        def open_engine_pipes():
+            engine_pipes.append(open(tmp_path / "to_engine.pipe", "r"))
+            engine_pipes.append(open(tmp_path / "from_engine.pipe", "w"))
+
+        thread = threading.Thread(target=open_engine_pipes)
+        thread.start()
+        connection = Connection(on_idle=on_idle, io_directory=str(tmp_path))
+        thread.join()
+        return connection, engine_pipes[1]
+
+    return open_connection
+
+
+@pytest.fixture(scope="session")
+def replay_queries(tmp_path_factory):
+    """Returns a function that replays the game log, and before each move yields the engine's state, the state of the
+    player making the move as the helper tracks it, and the query the move answered. The query's update is empty,
+    since the player's state already holds it.
+    """
+
+    path = tmp_path_factory.mktemp("game") / "game.json"
+    with gzip.open(GAME_LOG, "rb") as source, open(path, "wb") as target:
+        shutil.copyfileobj(source, target)
+
+    def replay_queries() -> Iterator[tuple[EngineState, ClientState, QueryType]]:
+        replay = GameReplay(str(path))
+        players = sorted(cast(RecordStartGame, replay.records[0]).players, key=lambda x: x.player_id)
+        state = EngineState(catalog=[{"team_id": x.team_id} for x in players])
+        mutator = ReplayStateMutator(state, replay.draws_after_shuffle)
+        censor = CensorRecord(state)
+        client_states = dict([(x.player_id, ClientState()) for x in players])
+        client_mutators = dict([(x, StateMutator(y)) for x, y in client_states.items()])
+
+        # The last record ends the game, and is never sent to the players.
+        while len(state.recording) < len(replay) - 1:
+            record = replay.records[len(state.recording)]
+            if isinstance(record, BaseMove):
+                yield (state, client_states[record.move_by_player], _get_query(record))
+
+            # Committing a MoveRedeemCards also commits the RecordRedeemedCards after it.
+            committed = len(state.recording)
+            mutator.commit(record)
+            for i in range(committed, len(state.recording)):
+                for player, client_mutator in client_mutators.items():
+                    client_mutator.commit(i, censor.censor(state.recording[i], player))
+
+    return replay_queries
+
+
+def _get_query(move: BaseMove) -> QueryType:
+    match move:
+        case MoveAttack() | MoveAttackPass():
+            return QueryAttack(update={})
+        case MoveClaimTerritory():
+            return QueryClaimTerritory(update={})
+        case MoveDefend() as r:
+            return QueryDefend(update={}, move_attack_id=r.move_attack_id)
+        case MoveDistributeTroops() as r:
+            return QueryDistributeTroops(update={}, cause=r.cause)
+        case MoveFortify() | MoveFortifyPass():
+            return QueryFortify(update={})
+        case MovePlaceInitialTroop():
+            return QueryPlaceInitialTroop(update={})
+        case MoveRedeemCards() as r:
+            return QueryRedeemCards(update={}, cause=r.cause)
+        case MoveTroopsAfterAttack() as r:
+            return QueryTroopsAfterAttack(update={}, record_attack_id=r.record_attack_id)
+        case _:
+            raise NotImplementedError
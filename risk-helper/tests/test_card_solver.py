@@ -0,0 +1,101 @@
+from itertools import combinations
+from random import Random
+from typing import Iterator, Optional
+
+import pytest
+
+from risk_engine.game.engine_state import EngineState
+from risk_engine.game.state_mutator import StateMutator
+from risk_engine.replay.game_replay import copy_state
+from risk_engine.validation.move_validator import MoveValidator
+from risk_helper.card_solver import best_card_redemption
+from risk_helper.client_state import ClientState
+from risk_shared.queries.query_redeem_cards import QueryRedeemCards
+from risk_shared.records.moves.move_redeem_cards import MoveRedeemCards
+
+
+WILDCARDS = [42, 43]
+
+
+def get_redemptions(cards: list[int]) -> Iterator[list[tuple[int, int, int]]]:
+    """Yields every way of picking disjoint triples of 'cards', whether or not they are sets.
+    """
+
+    yield []
+    for triple in combinations(cards, 3):
+        rest = [x for x in cards if x not in triple and cards.index(x) > cards.index(triple[0])]
+        for redemption in get_redemptions(rest):
+            yield [triple] + redemption
+
+
+def get_troops(state: EngineState, move: MoveRedeemCards) -> int:
+    """Returns the troops the engine gives for 'move', by committing it to a copy of 'state'.
+    """
+
+    state = copy_state(state)
+    troops_remaining = state.players[move.move_by_player].troops_remaining
+    StateMutator(state).commit(move)
+    return state.players[move.move_by_player].troops_remaining - troops_remaining
+
+
+def get_best_troops(state: EngineState, query: QueryRedeemCards, player: int) -> Optional[int]:
+    """Returns the most troops any redemption the engine accepts gives, by brute force, or None if it accepts none.
+    """
+
+    best = None
+    for sets in get_redemptions([x.card_id for x in state.players[player].cards]):
+        move = MoveRedeemCards(move_by_player=player, cause=query.cause, sets=sets)
+        try:
+            MoveValidator(state).validate(move, query, player)
+        except ValueError:
+            continue
+
+        troops = get_troops(state, move)
+        best = troops if best is None else max(best, troops)
+    return best
+
+
+def check_best_card_redemption(state: EngineState, client_state: ClientState, query: QueryRedeemCards) -> None:
+    player = client_state.me.player_id
+    solution = best_card_redemption(client_state, query)
+    best_troops = get_best_troops(state, query, player)
+    if best_troops is None:
+        assert solution is None
+        return
+
+    assert solution is not None
+    sets, troops = solution
+    move = MoveRedeemCards(move_by_player=player, cause=query.cause, sets=sets)
+    MoveValidator(state).validate(move, query, player)
+    assert troops == get_troops(state, move) == best_troops
+
+
+def test_redemptions_in_a_game(replay_queries):
+    causes = []
+    for state, client_state, query in replay_queries():
+        if isinstance(query, QueryRedeemCards):
+            check_best_card_redemption(state, client_state, query)
+            causes.append(query.cause)
+
+    assert "player_eliminated" in causes
+
+
+@pytest.mark.parametrize("cause", ["turn_started", "player_eliminated"])
+def test_redemptions_of_other_hands(replay_queries, cause):
+    # A position part way through the game, so the hands can hold cards for territories owned and not owned.
+    state, client_state, query = next(x for x in replay_queries() if isinstance(x[2], QueryRedeemCards) and len(x[0].recording) > 3000)
+    query = QueryRedeemCards(update={}, cause=cause)
+    player = client_state.me.player_id
+
+    # The deck only holds two wildcards, so the only hand of wildcards alone is those two, the next few hands have
+    # sets only by using a wildcard.
+    random = Random(0)
+    natural = [x for x in state.cards if x not in WILDCARDS]
+    hands = [WILDCARDS, WILDCARDS + [0], WILDCARDS + [0, 14], WILDCARDS + [0, 1, 14], WILDCARDS + [0, 1, 14, 15]]
+    hands += [random.sample(natural, 2) + random.sample(WILDCARDS, 1) for _ in range(5)]
+    hands += [random.sample(sorted(state.cards), size) for size in range(3, 10) for _ in range(15)]
+
+    for hand in hands:
+        state.players[player].cards = [state.cards[x] for x in hand]
+        client_state.me.cards = [client_state.cards[x] for x in hand]
+        check_best_card_redemption(state, client_state, query)
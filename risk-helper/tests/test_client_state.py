@@ -0,0 +1,47 @@
+from risk_helper.client_state import ClientState
+from risk_helper.state_mutator import StateMutator
+from risk_shared.models.player_model import PlayerModel, PublicPlayerModel
+from risk_shared.records.moves.move_attack import MoveAttack
+from risk_shared.records.moves.move_claim_territory import MoveClaimTerritory
+from risk_shared.records.record_start_game import PublicRecordStartGame
+
+
+def start_game(players: int = 3) -> tuple[ClientState, StateMutator]:
+    state = ClientState()
+    mutator = StateMutator(state)
+    you = PlayerModel(player_id=0, team_id=0, troops_remaining=0, alive=True, cards=[], must_place_territory_bonus=[])
+    public = [PublicPlayerModel(player_id=x, troops_remaining=0, alive=True, card_count=0, must_place_territory_bonus=[])
+              for x in range(players)]
+    mutator.commit(0, PublicRecordStartGame(turn_order=list(range(players)), players=public, you=you))
+    return state, mutator
+
+
+def claim(state: ClientState, mutator: StateMutator, claims: list[tuple[int, int]]) -> None:
+    for player, territory in claims:
+        mutator.commit(len(state.recording), MoveClaimTerritory(move_by_player=player, territory=territory))
+
+
+def test_same_board_with_different_player_to_move_hashes_differently():
+    first, first_mutator = start_game()
+    second, second_mutator = start_game()
+
+    # The same territories claimed in a different order, so only the player who moved last differs.
+    claim(first, first_mutator, [(0, 5), (1, 6)])
+    claim(second, second_mutator, [(1, 6), (0, 5)])
+
+    assert first.get_player_to_move() == 1
+    assert second.get_player_to_move() == 0
+    assert first.get_hash() != second.get_hash()
+
+    second.set_player_to_move(1)
+    assert first.get_hash() == second.get_hash()
+
+
+def test_attack_hands_the_move_to_the_defender():
+    state, mutator = start_game()
+    claim(state, mutator, [(0, 5), (2, 6)])
+    state.add_troops(5, 3)
+    state.add_troops(6, 1)
+
+    mutator.commit(len(state.recording), MoveAttack(move_by_player=0, attacking_territory=5, defending_territory=6, attacking_troops=2))
+    assert state.get_player_to_move() == 2
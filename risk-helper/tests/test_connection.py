@@ -0,0 +1,38 @@
+import os
+
+from risk_shared.queries.query_new_game import QueryNewGame
+
+
+def frame(data: str) -> str:
+    return str(len(data)) + "," + data
+
+
+def test_messages_sent_back_to_back_are_not_left_waiting(open_connection):
+    idle_steps = []
+    def on_idle():
+        idle_steps.append(None)
+        return False
+
+    connection, from_engine = open_connection(on_idle)
+
+    # The engine sends QueryNewGame and the first query of the next game without waiting for a reply, so both are read
+    # together, and the second must be seen as waiting rather than stepping background work until the engine gives up.
+    first = QueryNewGame(game=1, update={}).model_dump_json()
+    second = QueryNewGame(game=2, update={}).model_dump_json()
+    from_engine.write(frame(first) + frame(second))
+    from_engine.flush()
+
+    assert connection.get_next_query() == QueryNewGame(game=1, update={})
+    assert connection.get_next_query() == QueryNewGame(game=2, update={})
+    assert len(idle_steps) == 0
+
+
+def test_messages_split_across_reads(open_connection):
+    connection, from_engine = open_connection(None)
+
+    # A message with a multi-byte character, written a byte at a time.
+    message = frame('{"name": "Territoire d\\u2019été"}')
+    for byte in message.encode():
+        os.write(from_engine.fileno(), bytes([byte]))
+
+    assert connection._receive() == '{"name": "Territoire d\\u2019été"}'
@@ -0,0 +1,140 @@
+from risk_engine.game.engine_state import EngineState
+from risk_engine.validation.move_validator import MoveValidator
+from risk_helper.legal_moves import legal_attacks, legal_claims, legal_defending_troops, legal_distributions, legal_fortifies, legal_initial_placements, legal_troops_after_attack
+from risk_shared.queries.base_query import BaseQuery
+from risk_shared.queries.query_attack import QueryAttack
+from risk_shared.queries.query_claim_territory import QueryClaimTerritory
+from risk_shared.queries.query_defend import QueryDefend
+from risk_shared.queries.query_distribute_troops import QueryDistributeTroops
+from risk_shared.queries.query_fortify import QueryFortify
+from risk_shared.queries.query_place_initial_troop import QueryPlaceInitialTroop
+from risk_shared.queries.query_troops_after_attack import QueryTroopsAfterAttack
+from risk_shared.records.moves.move_attack import MoveAttack
+from risk_shared.records.moves.move_claim_territory import MoveClaimTerritory
+from risk_shared.records.moves.move_defend import MoveDefend
+from risk_shared.records.moves.move_distribute_troops import MoveDistributeTroops
+from risk_shared.records.moves.move_fortify import MoveFortify
+from risk_shared.records.moves.move_place_initial_troop import MovePlaceInitialTroop
+from risk_shared.records.moves.move_troops_after_attack import MoveTroopsAfterAttack
+from risk_shared.records.types.move_type import MoveType
+
+
+def is_legal(state: EngineState, query: BaseQuery, move: MoveType) -> bool:
+    try:
+        MoveValidator(state).validate(move, query, move.move_by_player)
+    except ValueError:
+        return False
+    return True
+
+
+def test_attacks(replay_queries):
+    queries = 0
+    for state, client_state, query in replay_queries():
+        if not isinstance(query, QueryAttack):
+            continue
+        queries += 1
+        player = client_state.me.player_id
+
+        attacks = set()
+        for attacking_territory, defending_territory, max_attacking_troops in legal_attacks(client_state):
+            attacks.add((attacking_territory, defending_territory, max_attacking_troops))
+            for troops in range(1, max_attacking_troops + 2):
+                move = MoveAttack(move_by_player=player, attacking_territory=attacking_territory, defending_territory=defending_territory, attacking_troops=troops)
+                assert is_legal(state, query, move) == (troops <= max_attacking_troops)
+
+        # Every attack the engine accepts is generated, checked on some of the queries since it is slow.
+        if queries % 25 == 0:
+            for attacking_territory in state.territories:
+                for defending_territory in state.map.get_adjacent_to(attacking_territory):
+                    legal_troops = [x for x in range(1, 4) if is_legal(state, query, MoveAttack(move_by_player=player, attacking_territory=attacking_territory,
+                                                                                                defending_territory=defending_territory, attacking_troops=x))]
+                    if len(legal_troops) > 0:
+                        assert (attacking_territory, defending_territory, max(legal_troops)) in attacks
+
+    assert queries > 0
+
+
+def test_fortifies(replay_queries):
+    queries = 0
+    for state, client_state, query in replay_queries():
+        if not isinstance(query, QueryFortify):
+            continue
+        queries += 1
+        player = client_state.me.player_id
+
+        fortifies = set()
+        for source_territory, target_territory, max_troop_count in legal_fortifies(client_state):
+            fortifies.add((source_territory, target_territory, max_troop_count))
+            for troop_count in [1, max_troop_count, max_troop_count + 1]:
+                move = MoveFortify(move_by_player=player, source_territory=source_territory, target_territory=target_territory, troop_count=troop_count)
+                assert is_legal(state, query, move) == (troop_count <= max_troop_count)
+
+        for source_territory in state.territories:
+            for target_territory in state.map.get_adjacent_to(source_territory):
+                if is_legal(state, query, MoveFortify(move_by_player=player, source_territory=source_territory, target_territory=target_territory, troop_count=1)):
+                    assert (source_territory, target_territory, state.territories[source_territory].troops - 1) in fortifies
+
+    assert queries > 0
+
+
+def test_distributions(replay_queries):
+    queries = 0
+    must_place_queries = 0
+    for state, client_state, query in replay_queries():
+        if not isinstance(query, QueryDistributeTroops):
+            continue
+        queries += 1
+        must_place_queries += len(client_state.me.must_place_territory_bonus) > 0
+
+        # Every owned territory gets troops, unless they all have to go on a matching territory.
+        distributions = list(legal_distributions(client_state))
+        owned = set(client_state.get_owned_bitset(client_state.me.player_id))
+        must_place = client_state.me.must_place_territory_bonus
+        covered = set([x for distribution in distributions for x in distribution])
+        assert covered == (owned if len(must_place) == 0 or client_state.me.troops_remaining > 2 else set([must_place[0]]))
+
+        for distribution in distributions:
+            # As Game.move_distribute_troops sends it, without the territories given no troops.
+            move = MoveDistributeTroops(move_by_player=client_state.me.player_id, cause=query.cause, distributions=dict([(x, y) for x, y in distribution.items() if y > 0]))
+            assert is_legal(state, query, move)
+
+    assert queries > 0
+    assert must_place_queries > 0
+
+
+def test_troops_after_attack(replay_queries):
+    queries = 0
+    only_choice_queries = 0
+    for state, client_state, query in replay_queries():
+        if not isinstance(query, QueryTroopsAfterAttack):
+            continue
+        queries += 1
+
+        troop_counts = legal_troops_after_attack(client_state, query)
+        only_choice_queries += len(troop_counts) == 1
+        for troop_count in range(troop_counts.start - 1, troop_counts.stop + 1):
+            move = MoveTroopsAfterAttack(move_by_player=client_state.me.player_id, record_attack_id=query.record_attack_id, troop_count=troop_count)
+            assert is_legal(state, query, move) == (troop_count in troop_counts)
+
+    assert queries > 0
+    assert only_choice_queries > 0
+
+
+def test_claims_placements_and_defences(replay_queries):
+    for state, client_state, query in replay_queries():
+        player = client_state.me.player_id
+        match query:
+            case QueryClaimTerritory():
+                claims = set(legal_claims(client_state))
+                for territory in state.territories:
+                    assert is_legal(state, query, MoveClaimTerritory(move_by_player=player, territory=territory)) == (territory in claims)
+
+            case QueryPlaceInitialTroop():
+                placements = set(legal_initial_placements(client_state))
+                for territory in state.territories:
+                    assert is_legal(state, query, MovePlaceInitialTroop(move_by_player=player, territory=territory)) == (territory in placements)
+
+            case QueryDefend():
+                defending_troops = legal_defending_troops(client_state, query)
+                for troops in range(0, 4):
+                    assert is_legal(state, query, MoveDefend(move_by_player=player, move_attack_id=query.move_attack_id, defending_troops=troops)) == (troops in defending_troops)
@@ -0,0 +1,60 @@
+from risk_helper.background_tasks import BackgroundTasks
+from risk_helper.speculator import Speculation, Speculator
+from risk_shared.queries.query_attack import QueryAttack
+from risk_shared.records.moves.move_attack_pass import MoveAttackPass
+from risk_shared.records.moves.move_fortify_pass import MoveFortifyPass
+
+
+def test_query_arriving_while_preparing_is_not_held_up(open_connection):
+    background_tasks = BackgroundTasks()
+    connection, from_engine = open_connection(background_tasks.step)
+    speculator = Speculator()
+
+    # A slow preparation, the query arrives after its first step.
+    steps_taken = []
+    def prepare(last_move):
+        for step in range(1000):
+            steps_taken.append(step)
+            if step == 0:
+                data = QueryAttack(update={}).model_dump_json()
+                from_engine.write(str(len(data)) + "," + data)
+                from_engine.flush()
+            yield None
+        yield lambda query: MoveAttackPass(move_by_player=0)
+
+    speculator.add(Speculation("attack", prepare))
+    background_tasks.add(speculator.restart(MoveFortifyPass(move_by_player=0)))
+
+    query = connection.get_next_query()
+    speculator.invalidate(query.update)
+    assert query == QueryAttack(update={})
+    assert steps_taken == [0]
+    assert speculator.answer(query) is None
+
+    # The rest of the preparation is dropped rather than run for the old state.
+    while background_tasks.step():
+        pass
+    assert steps_taken == [0]
+
+
+def test_prepared_answer_is_used():
+    background_tasks = BackgroundTasks()
+    speculator = Speculator()
+
+    def prepare(last_move):
+        yield None
+        yield lambda query: MoveAttackPass(move_by_player=0)
+
+    def prepare_unlikely(last_move):
+        return
+        yield
+
+    speculator.add(Speculation("fortify", prepare_unlikely))
+    speculator.add(Speculation("attack", prepare))
+    background_tasks.add(speculator.restart(MoveFortifyPass(move_by_player=0)))
+    while background_tasks.step():
+        pass
+
+    speculator.invalidate({})
+    assert speculator.answer(QueryAttack(update={})) == MoveAttackPass(move_by_player=0)
+    assert speculator.hits == 1
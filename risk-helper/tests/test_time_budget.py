@@ -0,0 +1,28 @@
+from risk_helper import time_budget
+from risk_helper.time_budget import TimeBudget
+from risk_shared.limits import CUMULATIVE_TIMEOUT_SECONDS
+
+
+def test_spending_every_deadline_stays_within_the_cumulative_limit(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(time_budget, "perf_counter", lambda: clock[0])
+
+    # A bot that always uses its whole deadline, while the engine charges more overhead per query than estimated.
+    budget = TimeBudget()
+    charged = 0.0
+    for _ in range(budget.expected_queries):
+        budget.start_query(clock[0])
+        deadline = budget.get_deadline()
+        charged += deadline.expires_at - clock[0] + 0.0007
+        clock[0] = deadline.expires_at
+        budget.end_query()
+
+    assert charged < CUMULATIVE_TIMEOUT_SECONDS
+
+
+def test_reserve_grows_with_the_queries_answered_past_those_expected():
+    budget = TimeBudget(expected_queries=0)
+    assert budget.reserved() == budget.safety_margin
+
+    budget.queries = 1000
+    assert budget.reserved() == budget.safety_margin + 1000 * budget.margin_per_query
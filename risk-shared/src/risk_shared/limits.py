@@ -0,0 +1,4 @@
+# The engine's time limits, a player is banned if they take longer than TIMEOUT_SECONDS to respond to a single query,
+# or longer than CUMULATIVE_TIMEOUT_SECONDS to respond to all of their queries over the whole game.
+TIMEOUT_SECONDS = 1
+CUMULATIVE_TIMEOUT_SECONDS = 6
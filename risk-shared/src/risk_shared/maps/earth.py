@@ -1,3 +1,5 @@
+from functools import cache
+
 from risk_shared.models.card_model import CardModel
 from risk_shared.maps.map import Map
 
@@ -419,4 +421,24 @@ def create_map():
         ],
     }
 
-    return Map(vertices=vertices, edges=edges, continents=continents, continent_bonuses=continent_bonuses)
\ No newline at end of file
+    return Map(vertices=vertices, edges=edges, continents=continents, continent_bonuses=continent_bonuses)
+
+
+@cache
+def get_map() -> Map:
+    """Returns the earth map, which is built once and shared by everything in the process.
+    """
+
+    return create_map()
+
+
+@cache
+def _get_cards() -> tuple[CardModel, ...]:
+    return tuple(create_cards().values())
+
+
+def get_cards() -> dict[int, CardModel]:
+    """Returns a new dict of the cards by id, the cards themselves are frozen and shared by everything in the process.
+    """
+
+    return dict([(card.card_id, card) for card in _get_cards()])
@@ -1,13 +1,50 @@
+from types import MappingProxyType
+from typing import Mapping
 
 
 class Map():
+    """A map of territories (vertices) and their adjacencies (edges), the territories must be numbered from 0.
 
-    def __init__(self, vertices, edges, continents, continent_bonuses):
-        self._vertices: dict[str, int] = vertices
-        self._vertex_names: dict[int, str] = dict([(y, x) for x, y in vertices.items()])
-        self._continents: dict[int, list[int]] = continents
-        self._continent_bonuses: dict[int, int] = continent_bonuses
-        self._edges: dict[int, list[int]] = edges
+    A map doesn't change once it's built, so one copy is shared by everything in the process (see earth.get_map),
+    the lists it returns are tuples and the dicts are read only. Alongside the adjacency lists it keeps the
+    adjacency as sets and as bitmasks (bit v of get_adjacency_mask(u) is set if v is adjacent to u, see
+    TerritoryBitset), each continent as a bitmask, and each territory's degree and continent, so these lookups are O(1).
+    """
+
+    def __init__(self, vertices: dict[str, int], edges: dict[int, list[int]], continents: dict[int, list[int]], continent_bonuses: dict[int, int]):
+        if sorted(vertices.values()) != list(range(len(vertices))):
+            raise ValueError("The territories of a map must be numbered 0 to n - 1.")
+
+        self._vertices: Mapping[str, int] = MappingProxyType(dict(vertices))
+        self._vertex_names: Mapping[int, str] = MappingProxyType(dict([(y, x) for x, y in vertices.items()]))
+        self._continents: Mapping[int, tuple[int, ...]] = MappingProxyType(dict([(x, tuple(y)) for x, y in continents.items()]))
+        self._continent_bonuses: Mapping[int, int] = MappingProxyType(dict(continent_bonuses))
+
+        count = len(vertices)
+        self._edges: tuple[tuple[int, ...], ...] = tuple(tuple(edges.get(v, [])) for v in range(count))
+        self._adjacent: tuple[frozenset[int], ...] = tuple(frozenset(x) for x in self._edges)
+        self._adjacency_masks: tuple[int, ...] = tuple(sum(1 << y for y in x) for x in self._adjacent)
+        self._degrees: tuple[int, ...] = tuple(len(x) for x in self._adjacent)
+
+        continent_of = [-1] * count
+        for continent, territories in self._continents.items():
+            for territory in territories:
+                continent_of[territory] = continent
+        self._continent_of: tuple[int, ...] = tuple(continent_of)
+        self._continent_masks: Mapping[int, int] = MappingProxyType(dict([(x, sum(1 << y for y in territories)) for x, territories in self._continents.items()]))
+        self._all_mask: int = (1 << count) - 1
+
+    # A map never changes, so copies of states that hold it share it, and pickling rebuilds it from its definition.
+    def __copy__(self) -> "Map":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "Map":
+        return self
+
+    def __reduce__(self):
+        edges = dict(enumerate([list(x) for x in self._edges]))
+        continents = dict([(x, list(y)) for x, y in self._continents.items()])
+        return (Map, (dict(self._vertices), edges, continents, dict(self._continent_bonuses)))
 
     def get_vertices(self):
         return self._vertices.values()
@@ -15,20 +52,38 @@ class Map():
     def get_vertex_name(self, v: int):
         return self._vertex_names[v]
 
-    def get_continents(self):
+    def get_continents(self) -> Mapping[int, tuple[int, ...]]:
         return self._continents
     
     def get_continent_bonus(self, continent: int) -> int:
         return self._continent_bonuses[continent]
 
-    def get_adjacent_to(self, v: int):
+    def get_continent(self, v: int) -> int:
+        return self._continent_of[v]
+
+    def get_continent_mask(self, continent: int) -> int:
+        return self._continent_masks[continent]
+
+    def get_all_mask(self) -> int:
+        return self._all_mask
+
+    def get_adjacent_to(self, v: int) -> tuple[int, ...]:
         return self._edges[v]
+
+    def get_adjacent_set(self, v: int) -> frozenset[int]:
+        return self._adjacent[v]
+
+    def get_adjacency_mask(self, v: int) -> int:
+        return self._adjacency_masks[v]
+
+    def get_degree(self, v: int) -> int:
+        return self._degrees[v]
     
-    def is_adjacent(self, v1: int, v2: int):
-        return v2 in self._edges[v1]
+    def is_adjacent(self, v1: int, v2: int) -> bool:
+        return v2 in self._adjacent[v1]
     
     def _check_graph_validity(self):
-        for vertex, edges in self._edges.items():
+        for vertex, edges in enumerate(self._edges):
             for edge in edges:
                 if not vertex in self._edges[edge]:
                     print(self._vertex_names[vertex], "->", self._vertex_names[edge], "no backwards edge")
@@ -38,6 +93,6 @@ class Map():
 
 
 if __name__ == "__main__":
-    from risk_shared.maps.earth import create_map
-    earth = create_map()
+    from risk_shared.maps.earth import get_map
+    earth = get_map()
     earth._check_graph_validity()
\ No newline at end of file
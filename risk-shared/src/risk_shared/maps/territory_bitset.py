@@ -0,0 +1,114 @@
+from typing import Iterable, Iterator
+
+from risk_shared.maps.map import Map
+
+
+class TerritoryBitset():
+    """An immutable set of territories stored as the bits of an int, bit v is set if territory v is in the set.
+
+    Union (|), intersection (&), difference (-) and symmetric difference (^) are single integer operations, so
+    set algebra on groups of territories is much cheaper than building Python sets from lists, for example
+
+        mine = game.state.get_owned_bitset(game.state.me.player_id)
+        enemies = TerritoryBitset.all(game.state.map) - mine
+        border = mine & enemies.neighbours(game.state.map)
+
+    Iterating yields the territories in increasing order. The width isn't fixed, so any size of map works.
+    """
+
+    __slots__ = ("mask",)
+
+    def __init__(self, mask: int = 0):
+        self.mask = mask
+
+
+    @staticmethod
+    def of(territories: Iterable[int]) -> "TerritoryBitset":
+        mask = 0
+        for territory in territories:
+            mask |= 1 << territory
+        return TerritoryBitset(mask)
+
+
+    @staticmethod
+    def all(map: Map) -> "TerritoryBitset":
+        return TerritoryBitset(map.get_all_mask())
+
+
+    @staticmethod
+    def continent(map: Map, continent: int) -> "TerritoryBitset":
+        return TerritoryBitset(map.get_continent_mask(continent))
+
+
+    def neighbours(self, map: Map) -> "TerritoryBitset":
+        """Returns the territories adjacent to any territory in this set, which may include some of this set.
+        """
+
+        mask = 0
+        for territory in self:
+            mask |= map.get_adjacency_mask(territory)
+        return TerritoryBitset(mask)
+
+
+    def count(self) -> int:
+        return self.mask.bit_count()
+
+
+    def to_list(self) -> list[int]:
+        return list(self)
+
+
+    def __iter__(self) -> Iterator[int]:
+        mask = self.mask
+        while mask:
+            lowest = mask & -mask
+            yield lowest.bit_length() - 1
+            mask ^= lowest
+
+
+    def __len__(self) -> int:
+        return self.mask.bit_count()
+
+
+    def __bool__(self) -> bool:
+        return self.mask != 0
+
+
+    def __contains__(self, territory: int) -> bool:
+        return (self.mask >> territory) & 1 == 1
+
+
+    def __or__(self, other: "TerritoryBitset") -> "TerritoryBitset":
+        return TerritoryBitset(self.mask | other.mask)
+
+
+    def __and__(self, other: "TerritoryBitset") -> "TerritoryBitset":
+        return TerritoryBitset(self.mask & other.mask)
+
+
+    def __sub__(self, other: "TerritoryBitset") -> "TerritoryBitset":
+        return TerritoryBitset(self.mask & ~other.mask)
+
+
+    def __xor__(self, other: "TerritoryBitset") -> "TerritoryBitset":
+        return TerritoryBitset(self.mask ^ other.mask)
+
+
+    def __le__(self, other: "TerritoryBitset") -> bool:
+        return self.mask & ~other.mask == 0
+
+
+    def __ge__(self, other: "TerritoryBitset") -> bool:
+        return other.mask & ~self.mask == 0
+
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, TerritoryBitset) and self.mask == other.mask
+
+
+    def __hash__(self) -> int:
+        return hash(self.mask)
+
+
+    def __repr__(self) -> str:
+        return f"TerritoryBitset({self.to_list()})"
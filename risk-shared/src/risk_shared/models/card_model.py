@@ -1,8 +1,9 @@
 from typing import Literal, Optional, Union
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class CardModel(BaseModel):
+    model_config = ConfigDict(frozen=True)
     card_id: int
     territory_id: Optional[int]
     symbol: Union[Literal["Infantry"], Literal["Cavalry"], Literal["Artillery"], Literal["Wildcard"]]
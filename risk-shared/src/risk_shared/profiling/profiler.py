@@ -0,0 +1,92 @@
+import tracemalloc
+from typing import TYPE_CHECKING, Literal, Optional, Union, cast
+
+if TYPE_CHECKING:
+    import cProfile
+    from risk_shared.profiling.sampling_profiler import SamplingProfiler
+
+
+ProfileMode = Union[Literal["cprofile"], Literal["sampling"]]
+PROFILE_MODES = ["cprofile", "sampling"]
+
+
+def get_profile_mode(value: Optional[str]) -> Optional[ProfileMode]:
+    """Parses a profile mode from a command line option or environment variable, an empty value disables profiling.
+    """
+
+    if value is None or value == "":
+        return None
+    if value not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{value}', expected one of {', '.join(PROFILE_MODES)}.")
+    return cast(ProfileMode, value)
+
+
+class Profiler():
+    """Runs cProfile or the sampling profiler, optionally along with tracemalloc, and writes their results.
+
+    'dump' can be called while profiling to write the results so far, so a profile survives the process
+    being killed later. The files written are '<prefix>.prof' (cProfile, open with pstats or snakeviz),
+    '<prefix>_samples.txt' (sampling, collapsed stacks) and '<prefix>_memory.txt' (tracemalloc).
+    """
+
+    def __init__(self, mode: Optional[ProfileMode] = None, trace_memory: bool = False):
+        self.mode = mode
+        self.trace_memory = trace_memory
+        self._cprofile: Optional["cProfile.Profile"] = None
+        self._sampling: Optional["SamplingProfiler"] = None
+
+        # Only import the profiler that is used, since every bot and the engine import this module.
+        if mode == "cprofile":
+            import cProfile
+            self._cprofile = cProfile.Profile()
+        elif mode == "sampling":
+            from risk_shared.profiling.sampling_profiler import SamplingProfiler
+            self._sampling = SamplingProfiler()
+        self.running = False
+
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode is not None or self.trace_memory
+
+
+    def start(self) -> None:
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        if self._sampling is not None:
+            self._sampling.start()
+        if self.trace_memory:
+            tracemalloc.start()
+        self.running = True
+
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._sampling is not None:
+            self._sampling.stop()
+        if self.trace_memory:
+            tracemalloc.stop()
+        self.running = False
+
+
+    def dump(self, directory: str, prefix: str) -> None:
+        if self._cprofile is not None:
+
+            # Writing the stats disables the profiler, so resume it afterwards if it was running.
+            self._cprofile.dump_stats(f"{directory}/{prefix}.prof")
+            if self.running:
+                self._cprofile.enable()
+
+        if self._sampling is not None:
+            self._sampling.write_collapsed(f"{directory}/{prefix}_samples.txt")
+
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics("lineno")
+            with open(f"{directory}/{prefix}_memory.txt", "w") as f:
+                f.write(f"current: {current} bytes\npeak: {peak} bytes\n\n")
+                for statistic in statistics[:50]:
+                    f.write(f"{statistic}\n")
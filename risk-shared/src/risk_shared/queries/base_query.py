@@ -1,9 +1,13 @@
 from typing import Mapping
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 from risk_shared.records.types.record_type import RecordType
 
 
 class BaseQuery(BaseModel):
+
+    # Each query's validator includes every record type, building them all on import is slow and bots never use them,
+    # see build_query_models.
+    model_config = ConfigDict(defer_build=True)
     query_type: str
     update: Mapping[int, RecordType] = Field(discriminator="record_type")
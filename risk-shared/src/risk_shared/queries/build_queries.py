@@ -0,0 +1,19 @@
+from typing import Type, get_args
+
+from risk_shared.queries.base_query import BaseQuery
+from risk_shared.queries.query_new_game import QueryNewGame
+from risk_shared.queries.query_type import QueryType
+
+
+def get_query_models() -> list[Type[BaseQuery]]:
+    return [*get_args(QueryType), QueryNewGame]
+
+
+def build_query_models() -> None:
+    """Queries defer building their validators and serializers until first used, since bots only ever parse them
+    through a single union (which builds its own validator), this builds them all now instead, so the first use of
+    each isn't slowed down, for example while a player's time is being measured.
+    """
+
+    for model in get_query_models():
+        model.model_rebuild()
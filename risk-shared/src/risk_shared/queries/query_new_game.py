@@ -0,0 +1,11 @@
+from typing import Literal
+
+from risk_shared.queries.base_query import BaseQuery
+
+
+class QueryNewGame(BaseQuery):
+    """Sent between the games of a multi-game session, the next game starts from record 0 and this doesn't need a response.
+    """
+
+    query_type: Literal["new_game"] = "new_game"
+    game: int